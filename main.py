@@ -1,8 +1,28 @@
 import customtkinter as ctk
-from tkinter import messagebox
-from modules.profile_manager import load_profiles, save_profiles, ProfileDialog
+from tkinter import filedialog, messagebox
+from modules.profile_manager import (
+    load_profiles,
+    save_profiles,
+    load_settings,
+    ProfileDialog,
+)
 from modules.process_runner import ProcessRunner
-from modules.ports_checker import gather_port_entries, PortsPopup
+from modules.profile_templates import ProfileResolver
+from modules.ports_checker import PortsPopup
+from modules.port_monitor import PortMonitor, entry_port, ports_for_pids
+from modules.launch_scheduler import LaunchScheduler, QUEUED, RUNNING, STARTING
+from modules.daemon import RemoteRunner, ensure_daemon
+from modules.run_history import HistoryStore, HistoryPopup
+from modules.console import ConsoleView
+from modules.log_viewer import LogViewer
+from modules.sampling_profiler import SamplingProfiler
+from modules.capture import (
+    CAPTURE_DIR,
+    CaptureReplayer,
+    CaptureWriter,
+    capture_path,
+)
+from modules.health_checks import HealthChecker, parse_check, UP, DEGRADED, DOWN
 
 
 class LauncherApp(ctk.CTk):
@@ -18,8 +38,26 @@ class LauncherApp(ctk.CTk):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
 
-        # Load profiles
+        # Load profiles and launcher settings
         self.profiles = load_profiles()
+        self.settings = load_settings()
+        # Resolves vars/env/extends/instances once per profile (cached)
+        self.resolver = ProfileResolver()
+        self.history = HistoryStore()
+
+        # One shared background port scanner for the popup and the run tabs
+        self.port_monitor = PortMonitor(
+            fast_interval=self.settings["port_scan_fast_s"],
+            idle_interval=self.settings["port_scan_idle_s"],
+        )
+        self._ports_changed = True
+        self._runs_finished = False  # set by runner threads when a run ends
+        self.port_monitor.subscribe(self._on_ports_changed)
+        self.port_monitor.start()
+
+        # Step health checks of all runs share one asyncio loop thread
+        self.health = HealthChecker()
+        self.health.start()
 
         # Create main container
         self.grid_columnconfigure(1, weight=1)
@@ -39,6 +77,8 @@ class LauncherApp(ctk.CTk):
         self.profile_frame = ctk.CTkScrollableFrame(left_frame, width=230, height=300)
         self.profile_frame.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
         self.profile_buttons = {}  # name -> button
+        self.profile_checks = {}  # name -> checkbox (multi-select for group runs)
+        self.checked_profiles = set()  # names ticked for "Run Group"
         self._refresh_profile_list()
 
         # Buttons frame
@@ -69,6 +109,19 @@ class LauncherApp(ctk.CTk):
         )
         self.run_button.grid(row=3, column=0, padx=10, pady=(5, 0), sticky="ew")
 
+        # Group / all runs go through the global launch queue
+        group_frame = ctk.CTkFrame(left_frame, fg_color="transparent")
+        group_frame.grid(row=4, column=0, padx=10, pady=(5, 0), sticky="ew")
+        group_frame.grid_columnconfigure((0, 1), weight=1)
+
+        ctk.CTkButton(
+            group_frame, text="Run Group", width=110, command=self._run_group
+        ).grid(row=0, column=0, padx=(0, 2), sticky="ew")
+
+        ctk.CTkButton(
+            group_frame, text="Run All", width=110, command=self._run_all_profiles
+        ).grid(row=0, column=1, padx=(2, 0), sticky="ew")
+
         # Show Ports button
         ctk.CTkButton(
             left_frame,
@@ -77,7 +130,38 @@ class LauncherApp(ctk.CTk):
             fg_color=["#3B8ED0", "#1F6AA5"],  # Original blue color
             hover_color=["#2B7FD9", "#1A5F9C"],  # Original hover color
             command=self._show_ports,
-        ).grid(row=4, column=0, padx=10, pady=(5, 5), sticky="ew")
+        ).grid(row=5, column=0, padx=10, pady=(5, 0), sticky="ew")
+
+        # Run history / startup analytics
+        ctk.CTkButton(
+            left_frame, text="History", width=230, command=self._show_history
+        ).grid(row=6, column=0, padx=10, pady=(5, 0), sticky="ew")
+
+        # Viewer for large historical log files / replay of captured runs
+        log_frame = ctk.CTkFrame(left_frame, fg_color="transparent")
+        log_frame.grid(row=7, column=0, padx=10, pady=(5, 0), sticky="ew")
+        log_frame.grid_columnconfigure((0, 1), weight=1)
+
+        ctk.CTkButton(
+            log_frame, text="Open Log...", width=110, command=self._open_log
+        ).grid(row=0, column=0, padx=(0, 2), sticky="ew")
+
+        ctk.CTkButton(
+            log_frame, text="Replay...", width=110, command=self._replay_capture
+        ).grid(row=0, column=1, padx=(2, 0), sticky="ew")
+
+        # Sampling profiler for diagnosing a sluggish or hanging window
+        self.profiler = SamplingProfiler(self.settings["profiler_interval_ms"] / 1000)
+        self._profiling_daemon = False  # the daemon samples alongside the window
+        self.profiler_button = ctk.CTkButton(
+            left_frame,
+            text="Start Profiler",
+            width=230,
+            fg_color="gray30",
+            hover_color="gray25",
+            command=self._toggle_profiler,
+        )
+        self.profiler_button.grid(row=8, column=0, padx=10, pady=(5, 5), sticky="ew")
 
         # === Right frame: Notebook for multiple consoles ===
         right_frame = ctk.CTkFrame(self)
@@ -132,30 +216,65 @@ class LauncherApp(ctk.CTk):
 
         # Track runners and their tabs
         self.runners = {}  # run_id -> ProcessRunner
-        self.run_tabs = {}  # run_id -> frame
+        self.run_tabs = {}  # run_id -> tab name
+        self.run_status_labels = {}  # run_id -> label showing queued/running state
+        self.run_port_labels = {}  # run_id -> label listing the run's listening ports
+        self.run_health_labels = {}  # run_id -> label with the run's health summary
+        self.run_health = {}  # run_id -> [(step label, check key or error), ...]
+        self.run_profiles = {}  # run_id -> resolved profile the run was started from
         self.run_counter = 0
         self.selected_profile = None
 
+        # Global launch queue: caps how many steps start/run at once
+        self.scheduler = LaunchScheduler(
+            max_steps=self.settings["max_concurrent_steps"],
+            max_load_per_cpu=self.settings["max_load_per_cpu"],
+            max_cpu_percent=self.settings["max_cpu_percent"],
+        )
+
+        # Runs live in the background daemon when available, so they survive
+        # restarts of this window; otherwise they run inside this process.
+        self.daemon = ensure_daemon() if self.settings["use_daemon"] else None
+        if self.daemon:
+            self._reattach_daemon_runs()
+
         # Initially show placeholder
         self._update_console_view()
+        self._poll_launch_queue()
 
     def _refresh_profile_list(self):
         # Clear existing buttons
         for button in self.profile_buttons.values():
             button.destroy()
         self.profile_buttons.clear()
+        for check in self.profile_checks.values():
+            check.destroy()
+        self.profile_checks.clear()
+        names = {p["name"] for p in self.profiles}
+        self.checked_profiles &= names
 
         # Create new buttons
         for i, profile in enumerate(self.profiles):
+            check = ctk.CTkCheckBox(
+                self.profile_frame,
+                text="",
+                width=24,
+                command=lambda n=profile["name"]: self._toggle_checked(n),
+            )
+            if profile["name"] in self.checked_profiles:
+                check.select()
+            check.grid(row=i, column=0, padx=(5, 0), pady=2)
+            self.profile_checks[profile["name"]] = check
+
             btn = ctk.CTkButton(
                 self.profile_frame,
                 text=profile["name"],
-                width=200,
+                width=170,
                 fg_color=("gray75", "gray30"),  # Default unselected color
                 hover_color=("gray65", "gray40"),  # Hover color
                 command=lambda p=profile: self._select_profile(p),
             )
-            btn.grid(row=i, column=0, padx=5, pady=2, sticky="ew")
+            btn.grid(row=i, column=1, padx=5, pady=2, sticky="ew")
             self.profile_buttons[profile["name"]] = btn
 
     def _select_profile(self, profile):
@@ -170,6 +289,12 @@ class LauncherApp(ctk.CTk):
         self.selected_profile = profile
         self._update_run_button_state()
 
+    def _toggle_checked(self, name):
+        if self.profile_checks[name].get():
+            self.checked_profiles.add(name)
+        else:
+            self.checked_profiles.discard(name)
+
     def _add_profile(self):
         def save_callback(new_profile):
             existing = [p["name"] for p in self.profiles]
@@ -185,6 +310,7 @@ class LauncherApp(ctk.CTk):
             else:
                 self.profiles.append(new_profile)
             save_profiles(self.profiles)
+            self.resolver.invalidate()
             self._refresh_profile_list()
 
         ProfileDialog(self, profile=None, on_save=save_callback)
@@ -201,6 +327,7 @@ class LauncherApp(ctk.CTk):
                     self.profiles[i] = edited_profile
                     break
             save_profiles(self.profiles)
+            self.resolver.invalidate()
             self._refresh_profile_list()
             # Reselect the edited profile
             self._select_profile(edited_profile)
@@ -216,6 +343,7 @@ class LauncherApp(ctk.CTk):
         if messagebox.askyesno("Confirm Delete", f"Delete profile '{profile_name}'?"):
             self.profiles = [p for p in self.profiles if p["name"] != profile_name]
             save_profiles(self.profiles)
+            self.resolver.invalidate()
             self._refresh_profile_list()
             self.selected_profile = None
             self._update_run_button_state()
@@ -225,32 +353,181 @@ class LauncherApp(ctk.CTk):
             messagebox.showinfo("Info", "Please select a profile to run.")
             return
 
-        profile = self.selected_profile
-        profile_name = profile["name"]
+        profile_name = self.selected_profile["name"]
+        if self.selected_profile.get("template"):
+            messagebox.showinfo(
+                "Info", f"Profile '{profile_name}' is a template and is not run itself."
+            )
+            return
+        concrete = self._concrete_profiles(self.selected_profile)
+        if concrete is None:
+            return
+        if all(self._is_profile_active(p["name"]) for p in concrete):
+            messagebox.showinfo("Info", f"Profile '{profile_name}' is already running.")
+            return
+        for profile in concrete:
+            if not self._is_profile_active(profile["name"]):
+                self._launch_profile(profile)
+
+    def _run_group(self):
+        group = [p for p in self.profiles if p["name"] in self.checked_profiles]
+        if not group:
+            messagebox.showinfo("Info", "Tick one or more profiles to run as a group.")
+            return
+        self._launch_profiles(group)
 
-        # Check if this profile is already running
-        for runner in self.runners.values():
-            if runner.profile_name == profile_name and runner.is_running:
-                messagebox.showinfo(
-                    "Info", f"Profile '{profile_name}' is already running."
-                )
-                return
+    def _run_all_profiles(self):
+        if not self.profiles:
+            messagebox.showinfo("Info", "There are no profiles to run.")
+            return
+        self._launch_profiles(self.profiles)
+
+    def _launch_profiles(self, profiles):
+        """Queue several profiles at once, skipping ones that are already active."""
+        skipped = []
+        for stored in profiles:
+            if stored.get("template"):
+                continue
+            for profile in self._concrete_profiles(stored) or []:
+                if self._is_profile_active(profile["name"]):
+                    skipped.append(profile["name"])
+                else:
+                    self._launch_profile(profile)
+        if skipped:
+            messagebox.showinfo(
+                "Info", "Already running, not queued again: " + ", ".join(skipped)
+            )
+
+    def _concrete_profiles(self, profile):
+        """Resolved launch-ready profiles for a stored one, or None on error."""
+        try:
+            return self.resolver.resolve(profile, self.profiles)
+        except (ValueError, OSError, TypeError, KeyError) as e:
+            messagebox.showerror(
+                "Error", f"Could not resolve profile '{profile['name']}': {e}"
+            )
+            return None
+
+    def _is_profile_active(self, profile_name):
+        """True if a run of this profile is queued, starting or running."""
+        return any(
+            runner.profile_name == profile_name
+            and (runner.is_running or self.scheduler.state(rid) == QUEUED)
+            for rid, runner in self.runners.items()
+        )
+
+    def _launch_profile(self, profile):
+        """Create a console tab for the profile and submit it to the launch queue."""
+        busy = self._busy_ports(profile)
+        if busy and not messagebox.askyesno(
+            "Port In Use",
+            f"Profile '{profile['name']}' needs ports that are already in use:\n\n"
+            + "\n".join(busy)
+            + "\n\nStart it anyway?",
+        ):
+            return None
+        run_id, on_output, on_finish = self._create_run_tab(profile["name"])
+
+        if self.daemon:
+            runner = RemoteRunner(self.daemon, profile, on_output, on_finish)
+        else:
+            runner = ProcessRunner(
+                profile["steps"],
+                on_output,
+                on_finish,
+                max_lines_per_sec=self.settings["max_lines_per_sec"],
+                spawn_workers=self.settings["spawn_workers"],
+            )
+            runner.profile_name = profile["name"]
+            runner.port_monitor = self.port_monitor
+            if self.settings["record_history"]:
+                runner.on_metrics = self.history.recorder(profile["name"])
+            if self.settings["capture_runs"]:
+                try:
+                    runner.capture = CaptureWriter(capture_path(profile["name"]))
+                except OSError as e:
+                    on_output(f"‼ Could not open a capture file: {e}\n")
+        self.runners[run_id] = runner
+        self.run_profiles[run_id] = profile
+
+        # Initial banner
+        on_output(f"🔹 Running profile: {profile['name']}\n")
+        self.scheduler.submit(run_id, runner)
+        if self.scheduler.state(run_id) == QUEUED:
+            on_output("⏳ Waiting in launch queue for free capacity...\n")
+        self._update_run_status(run_id)
+        self._update_run_button_state()
+        self._update_console_view()  # Update view to show notebook
 
+        # Switch to the new tab
+        self.notebook.set(f"{profile['name']} ({run_id})")
+        return run_id
+
+    def _busy_ports(self, profile):
+        """
+        Describe the profile's declared step ports ("ports": [3000, ...]) that the
+        cached port snapshot shows as already listening. No scan is done here.
+        """
+        entries, _ = self.port_monitor.snapshot()
+        owners = {}
+        for entry in entries:
+            owners.setdefault(entry_port(entry), entry)
+        busy = []
+        for step in profile["steps"]:
+            label = step.get("label") or step.get("command")
+            for port in step.get("ports", []):
+                entry = owners.get(str(port))
+                if entry:
+                    busy.append(
+                        f"{port} ({label}) - held by "
+                        f"{entry.get('program') or 'unknown'} "
+                        f"(PID {entry.get('pid', '?')})"
+                    )
+        return busy
+
+    def _reattach_daemon_runs(self):
+        """
+        Open a tab for every run the daemon is still running and replay its output.
+        Runs that finished while no window was open are dropped from the daemon
+        (their metrics stay in the run history, their output in a capture if
+        capture_runs is on) instead of reopening on every start.
+        """
+        try:
+            runs = self.daemon.list_runs()
+        except (OSError, ValueError):
+            return
+        for status in runs:
+            if status["finished"]:
+                try:
+                    self.daemon.request("forget", run_id=status["run_id"])
+                except (OSError, ValueError):
+                    pass
+                continue
+            run_id, on_output, on_finish = self._create_run_tab(status["profile_name"])
+            runner = RemoteRunner.reattach(self.daemon, status, on_output, on_finish)
+            self.runners[run_id] = runner
+            self.scheduler.adopt(run_id, runner)
+            self._update_run_status(run_id)
+
+    def _create_run_tab(self, profile_name):
+        """Add a console tab for a new run. Returns (run_id, on_output, on_finish)."""
         run_id = f"run_{self.run_counter}"
         self.run_counter += 1
 
         # Create a new tab
-        tab = self.notebook.add(f"{profile['name']} ({run_id})")
+        tab_name = f"{profile_name} ({run_id})"
+        tab = self.notebook.add(tab_name)
 
         # Create console frame
         console_frame = ctk.CTkFrame(tab)
         console_frame.pack(fill="both", expand=True, padx=5, pady=5)
 
-        # Create console
-        console = ctk.CTkTextbox(
+        # Create console (renders ANSI colors; output is applied in batches)
+        textbox = ctk.CTkTextbox(
             console_frame, wrap="none", font=ctk.CTkFont(family="Consolas", size=12)
         )
-        console.pack(fill="both", expand=True, padx=5, pady=5)
+        textbox.pack(fill="both", expand=True, padx=5, pady=5)
+        console = ConsoleView(textbox)
 
         # Create stop button
         stop_btn = ctk.CTkButton(
@@ -262,51 +539,165 @@ class LauncherApp(ctk.CTk):
         )
         stop_btn.pack(side="right", padx=5, pady=5)
 
-        self.run_tabs[run_id] = tab
+        # Close button (stops the run first if it is still going)
+        close_btn = ctk.CTkButton(
+            console_frame,
+            text="Close",
+            width=80,
+            fg_color="gray",
+            command=lambda rid=run_id: self._close_tab(rid),
+        )
+        close_btn.pack(side="right", padx=5, pady=5)
 
-        # Callbacks for ProcessRunner
-        def on_output(line, rid=run_id):
-            console.configure(state="normal")
-            console.insert("end", line)
-            console.see("end")
-            console.configure(state="disabled")
+        # Launch queue state (queued / starting / running / finished)
+        status_label = ctk.CTkLabel(
+            console_frame, text="Queued", font=ctk.CTkFont(size=12), text_color="gray"
+        )
+        status_label.pack(side="left", padx=10, pady=5)
 
-        def on_finish(rid=run_id):
-            console.configure(state="normal")
-            console.insert("end", "\n✅ All steps completed or stopped.\n")
-            console.see("end")
-            console.configure(state="disabled")
-            self._update_run_button_state()
+        # Ports the run's processes are listening on (from the shared monitor)
+        ports_label = ctk.CTkLabel(
+            console_frame, text="", font=ctk.CTkFont(size=12), text_color="gray"
+        )
+        ports_label.pack(side="left", padx=10, pady=5)
 
-        runner = ProcessRunner(profile["steps"], on_output, on_finish)
-        runner.profile_name = profile_name
-        self.runners[run_id] = runner
+        # Live health check results of steps that declare a health_check
+        health_label = ctk.CTkLabel(
+            console_frame, text="", font=ctk.CTkFont(size=12), text_color="gray"
+        )
+        health_label.pack(side="left", padx=10, pady=5)
 
-        # Initial banner
-        on_output(f"🔹 Running profile: {profile['name']}\n")
-        runner.start()
-        self._update_run_button_state()
-        self._update_console_view()  # Update view to show notebook
+        self.run_tabs[run_id] = tab_name
+        self.run_status_labels[run_id] = status_label
+        self.run_port_labels[run_id] = ports_label
+        self.run_health_labels[run_id] = health_label
+        self._ports_changed = True
 
-        # Switch to the new tab
-        self.notebook.set(f"{profile['name']} ({run_id})")
+        # Callbacks for the runner (called from its threads). Neither touches Tk
+        # directly: the console queues output and the finished flag is picked up
+        # by _poll_launch_queue on the Tk thread.
+        def on_finish(rid=run_id):
+            console.write("\n✅ All steps completed or stopped.\n")
+            self._runs_finished = True
+
+        return run_id, console.write, on_finish
+
+    def _poll_launch_queue(self):
+        """Start queued runs as capacity frees up and refresh per-run states."""
+        finished, self._runs_finished = self._runs_finished, False
+        if self.scheduler.pump() or finished:
+            self._update_run_button_state()
+        for run_id in self.run_status_labels:
+            self._update_run_status(run_id)
+        if self._ports_changed:
+            self._ports_changed = False
+            self._update_run_ports()
+        self._update_run_health()
+        self.after(500, self._poll_launch_queue)
+
+    def _on_ports_changed(self, event):
+        """Port monitor thread: just flag the change; the Tk poll picks it up."""
+        self._ports_changed = True
+
+    def _update_run_ports(self):
+        entries, _ = self.port_monitor.snapshot()
+        for run_id, label in self.run_port_labels.items():
+            runner = self.runners.get(run_id)
+            ports = ports_for_pids(entries, runner.pids()) if runner else []
+            text = "Ports: " + ", ".join(ports) if ports else ""
+            if label.cget("text") != text:
+                label.configure(text=text)
+
+    def _update_run_health(self):
+        """Start/stop health checks with each run and refresh its indicator."""
+        for run_id, runner in list(self.runners.items()):
+            active = self.scheduler.state(run_id) in (STARTING, RUNNING)
+            if active and run_id not in self.run_health:
+                self._start_health_checks(run_id, runner.profile_name)
+            elif not active and run_id in self.run_health:
+                self._stop_health_checks(run_id)
+            label = self.run_health_labels.get(run_id)
+            if label is None:
+                continue
+            parts, color = [], "gray"
+            for step_label, key in self.run_health.get(run_id, []):
+                result = self.health.result(key)
+                if result is None:
+                    parts.append(f"{step_label}: {key}")  # config error
+                    continue
+                state = result["state"]
+                if result["latency_ms"] is not None:
+                    parts.append(f"{step_label}: {state} {result['latency_ms']:.0f} ms")
+                else:
+                    parts.append(f"{step_label}: {state}")
+                if state == DOWN:
+                    color = "#d9534f"
+                elif state == DEGRADED and color != "#d9534f":
+                    color = "#f0ad4e"
+                elif state == UP and color == "gray":
+                    color = "#5cb85c"
+            text = "● " + " · ".join(parts) if parts else ""
+            if label.cget("text") != text or label.cget("text_color") != color:
+                label.configure(text=text, text_color=color)
+
+    def _start_health_checks(self, run_id, profile_name):
+        profile = self.run_profiles.get(run_id)
+        if profile is None:
+            # Reattached daemon run: find it among the resolved stored profiles
+            for stored in self.profiles:
+                try:
+                    concrete = self.resolver.resolve(stored, self.profiles)
+                except (ValueError, OSError, TypeError, KeyError):
+                    continue
+                profile = next(
+                    (p for p in concrete if p["name"] == profile_name), profile
+                )
+        checks = []
+        for i, step in enumerate(profile["steps"] if profile else []):
+            step_label = step.get("label") or f"step {i + 1}"
+            try:
+                spec = parse_check(step)
+            except (ValueError, TypeError) as e:
+                checks.append((step_label, f"bad health_check ({e})"))
+                continue
+            if spec:
+                key = f"{run_id}:{i}"
+                self.health.add(key, spec)
+                checks.append((step_label, key))
+        self.run_health[run_id] = checks
+
+    def _stop_health_checks(self, run_id):
+        for _, key in self.run_health.pop(run_id, []):
+            self.health.remove(key)
+
+    def _update_run_status(self, run_id):
+        label = self.run_status_labels.get(run_id)
+        if label is None:
+            return
+        state = self.scheduler.state(run_id)
+        if label.cget("text") != state.capitalize():
+            label.configure(text=state.capitalize())
 
     def _update_run_button_state(self):
         if not self.selected_profile:
             self.run_button.configure(state="disabled")
             return
 
-        # Check if this profile is already running
-        is_running = any(
-            runner.profile_name == self.selected_profile["name"] and runner.is_running
-            for runner in self.runners.values()
-        )
+        # Check if this profile is already running (or waiting to run)
+        is_running = self._is_profile_active(self.selected_profile["name"])
 
         self.run_button.configure(state="disabled" if is_running else "normal")
 
     def _stop_run(self, run_id):
         runner = self.runners.get(run_id)
-        if not runner or not runner.is_running:
+        if not runner:
+            return
+        if self.scheduler.cancel(run_id):
+            # Never started; just take it out of the queue
+            self._update_run_status(run_id)
+            self._update_run_button_state()
+            return
+        if not runner.is_running:
             return
         if messagebox.askyesno(
             "Stop", "Are you sure you want to stop this profile run?"
@@ -322,21 +713,148 @@ class LauncherApp(ctk.CTk):
             ):
                 return
             runner.stop_all()
+        self.scheduler.forget(run_id)
+        if isinstance(runner, RemoteRunner):
+            runner.detach()
+            runner.forget()
 
         # Remove the tab
-        tab = self.run_tabs.get(run_id)
-        if tab:
-            self.notebook.delete(tab)
+        tab_name = self.run_tabs.get(run_id)
+        if tab_name:
+            self.notebook.delete(tab_name)
             del self.run_tabs[run_id]
             del self.runners[run_id]
+            self.run_status_labels.pop(run_id, None)
+            self.run_port_labels.pop(run_id, None)
+            self.run_health_labels.pop(run_id, None)
+            self.run_profiles.pop(run_id, None)
+            self._stop_health_checks(run_id)
             self._update_run_button_state()
             self._update_console_view()  # Update view to show placeholder if no tabs
 
     def _show_ports(self):
-        entries = gather_port_entries()
-        PortsPopup(self, entries)
+        # Open straight from the cached snapshot; the popup boosts the monitor
+        # and reloads itself as fresh scans come in.
+        entries, _ = self.port_monitor.snapshot()
+        PortsPopup(self, entries, monitor=self.port_monitor)
+
+    def _show_history(self):
+        HistoryPopup(self, self.history)
+
+    def _open_log(self):
+        path = filedialog.askopenfilename(
+            title="Open Log File",
+            filetypes=[("Log files", "*.log *.txt *.out"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            LogViewer(self, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not open {path}: {e}")
+
+    def _replay_capture(self):
+        """Play a recorded capture back into a new console tab."""
+        path = filedialog.askopenfilename(
+            title="Replay Capture",
+            initialdir=str(CAPTURE_DIR) if CAPTURE_DIR.is_dir() else None,
+            filetypes=[("FluxPilot captures", "*.fpcap"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        answer = ctk.CTkInputDialog(
+            title="Replay Speed",
+            text="Speed: 1 = real time, 10 = ten times faster, max = no delays",
+        ).get_input()
+        if answer is None:
+            return
+        answer = answer.strip().lower().rstrip("x×") or "1"
+        if answer == "max":
+            speed = None
+        else:
+            try:
+                speed = float(answer)
+            except ValueError:
+                speed = 0
+            if speed <= 0:
+                messagebox.showerror("Error", "Enter a positive speed or 'max'.")
+                return
+
+        replayer = CaptureReplayer(path, None, speed=speed)
+        run_id, on_output, on_finish = self._create_run_tab(replayer.profile_name)
+        replayer.on_output, replayer.on_finish = on_output, on_finish
+        self.runners[run_id] = replayer
+        replayer.start()
+        self.scheduler.adopt(run_id, replayer)
+        self._update_run_status(run_id)
+        self._update_console_view()
+        self.notebook.set(f"{replayer.profile_name} ({run_id})")
+
+    def _toggle_profiler(self):
+        """Start sampling, or stop and export the collapsed stacks."""
+        if not self.profiler.running:
+            self.profiler.reset()
+            self.profiler.start()
+            # Runs (and their reader threads) live in the daemon: sample it too
+            self._profiling_daemon = False
+            if self.daemon:
+                try:
+                    self.daemon.request("profile", action="start")
+                    self._profiling_daemon = True
+                except (OSError, ValueError):
+                    pass
+            self.profiler_button.configure(text="Stop Profiler & Export")
+            return
+        self.profiler.stop()
+        self.profiler_button.configure(text="Start Profiler")
+        samples, overhead = self.profiler.stats()
+        if self._profiling_daemon:
+            try:
+                reply = self.daemon.request("profile", action="stop")
+                self.profiler.merge(reply["stacks"], "daemon")
+                scope = (
+                    f"\nplus {reply['samples']:,} daemon samples "
+                    f"({reply['overhead']:.2f}% overhead) under the 'daemon' frame"
+                )
+            except (OSError, ValueError) as e:
+                scope = f"\nOnly the window process was sampled (daemon: {e})."
+        elif self.daemon:
+            scope = "\nOnly the window process was sampled; runs live in the daemon."
+        else:
+            scope = ""
+        try:
+            path = self.profiler.export()
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write the profile: {e}")
+            return
+        messagebox.showinfo(
+            "Profiler",
+            f"{samples:,} samples ({overhead:.2f}% sampling overhead){scope}\n"
+            f"written to {path}\n\nOpen it with speedscope or flamegraph.pl.",
+        )
 
     def _on_close(self):
+        if self.daemon:
+            # Runs belong to the daemon and keep going; only queued ones are lost
+            queued = [
+                rid for rid in self.runners if self.scheduler.state(rid) == QUEUED
+            ]
+            if queued and not messagebox.askyesno(
+                "Exit",
+                f"{len(queued)} queued run(s) have not started yet and will be "
+                "dropped. Exit anyway?",
+            ):
+                return
+            for runner in self.runners.values():
+                if isinstance(runner, RemoteRunner):
+                    runner.detach()
+                else:
+                    # Replays live in this window and end with it
+                    runner.stop_all()
+            self.port_monitor.stop()
+            self.destroy()
+            return
+
         # If any runners still active, confirm and stop them
         active = [rid for rid, runner in self.runners.items() if runner.is_running]
         if active:
@@ -346,6 +864,7 @@ class LauncherApp(ctk.CTk):
                 return
             for rid in active:
                 self.runners[rid].stop_all()
+        self.port_monitor.stop()
         self.destroy()
 
     def _update_console_view(self):
@@ -0,0 +1,157 @@
+import re
+
+# Segment text that means "return to the start of the current line"
+CR = "\r"
+
+# Complete escape sequences we understand or deliberately drop
+_ESCAPE_RE = re.compile(
+    r"\x1b\[([0-?]*)[ -/]*([@-~])"  # CSI params (incl. private <=>?) final byte
+    r"|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)"  # OSC ... BEL / ST (titles, links)
+    r"|\x1b[ -/]+[0-~]"  # charset and similar escapes, e.g. ESC ( B from sgr0
+    r"|\x1b[0-Z\\^_`-~]"  # other two-byte escapes (not CSI/OSC introducers)
+)
+# The unfinished start of one of the sequences above, at the end of a chunk
+_PARTIAL_RE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*\x1b?|[ -/]*)\Z")
+
+# xterm default palette for the 16 basic colors (normal, then bright)
+BASIC_COLORS = [
+    "#000000",
+    "#cd3131",
+    "#0dbc79",
+    "#e5e510",
+    "#2472c8",
+    "#bc3fbc",
+    "#11a8cd",
+    "#e5e5e5",
+    "#666666",
+    "#f14c4c",
+    "#23d18b",
+    "#f5f543",
+    "#3b8eea",
+    "#d670d6",
+    "#29b8db",
+    "#ffffff",
+]
+
+# Style tuple fields: (foreground, background, bold, underline, inverse)
+DEFAULT_STYLE = (None, None, False, False, False)
+
+
+def color_256(n):
+    """Hex color for an xterm 256-color palette index."""
+    if n < 16:
+        return BASIC_COLORS[n]
+    if n < 232:
+        n -= 16
+        levels = [0, 95, 135, 175, 215, 255]
+        r, g, b = levels[n // 36], levels[(n // 6) % 6], levels[n % 6]
+        return f"#{r:02x}{g:02x}{b:02x}"
+    gray = 8 + (n - 232) * 10
+    return f"#{gray:02x}{gray:02x}{gray:02x}"
+
+
+class AnsiParser:
+    """
+    Streaming parser turning terminal output into (text, style) segments.
+
+    Feed it text in arbitrary chunks; escape sequences split across chunks are
+    held back until complete. SGR (color/bold/underline) sequences update the
+    current style, other control sequences are dropped, and a carriage return not
+    followed by a newline becomes a (CR, None) segment so the console can redraw
+    progress bars in place. Styles are plain tuples, so equal styles compare and
+    hash equal and can be interned by the consumer.
+    """
+
+    def __init__(self):
+        self.style = DEFAULT_STYLE
+        self._pending = ""
+
+    def feed(self, text):
+        """Parse a chunk of output. Returns a list of (text, style) segments."""
+        text = self._pending + text
+        self._pending = ""
+        # Hold back an unfinished escape sequence or a CR that may precede "\n"
+        cut = text.rfind("\x1b")
+        if cut != -1 and len(text) - cut < 64 and _PARTIAL_RE.match(text, cut):
+            self._pending = text[cut:]
+            text = text[:cut]
+        elif text.endswith("\r"):
+            self._pending = "\r"
+            text = text[:-1]
+
+        segments = []
+        pos = 0
+        for match in _ESCAPE_RE.finditer(text):
+            if match.start() > pos:
+                self._add_text(segments, text[pos : match.start()])
+            params = match.group(1)
+            if match.group(2) == "m" and params[:1] not in ("<", "=", ">", "?"):
+                self._apply_sgr(params)
+            pos = match.end()
+        if pos < len(text):
+            self._add_text(segments, text[pos:])
+        return segments
+
+    def _add_text(self, segments, text):
+        text = text.replace("\r\n", "\n")
+        style = None if self.style == DEFAULT_STYLE else self.style
+        parts = text.split("\r")
+        for i, part in enumerate(parts):
+            if i:
+                segments.append((CR, None))
+            part = part.replace("\x1b", "")
+            if part:
+                if segments and segments[-1][1] == style and segments[-1][0] != CR:
+                    segments[-1] = (segments[-1][0] + part, style)
+                else:
+                    segments.append((part, style))
+
+    def _apply_sgr(self, params):
+        fg, bg, bold, underline, inverse = self.style
+        codes = [
+            int(c) if c.isdigit() else 0 for c in params.replace(":", ";").split(";")
+        ]
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            if code == 0:
+                fg, bg, bold, underline, inverse = DEFAULT_STYLE
+            elif code == 1:
+                bold = True
+            elif code == 22:
+                bold = False
+            elif code == 4:
+                underline = True
+            elif code == 24:
+                underline = False
+            elif code == 7:
+                inverse = True
+            elif code == 27:
+                inverse = False
+            elif 30 <= code <= 37:
+                fg = BASIC_COLORS[code - 30]
+            elif 90 <= code <= 97:
+                fg = BASIC_COLORS[code - 90 + 8]
+            elif code == 39:
+                fg = None
+            elif 40 <= code <= 47:
+                bg = BASIC_COLORS[code - 40]
+            elif 100 <= code <= 107:
+                bg = BASIC_COLORS[code - 100 + 8]
+            elif code == 49:
+                bg = None
+            elif code in (38, 48) and i + 1 < len(codes):
+                color = None
+                if codes[i + 1] == 5 and i + 2 < len(codes):
+                    color = color_256(min(codes[i + 2], 255))
+                    i += 2
+                elif codes[i + 1] == 2 and i + 4 < len(codes):
+                    r, g, b = (min(c, 255) for c in codes[i + 2 : i + 5])
+                    color = f"#{r:02x}{g:02x}{b:02x}"
+                    i += 4
+                if code == 38:
+                    fg = color
+                else:
+                    bg = color
+            i += 1
+        self.style = (fg, bg, bold, underline, inverse)
@@ -0,0 +1,218 @@
+"""
+Compact binary capture of run output, and replay of captures.
+
+File layout: the 8-byte MAGIC, one flags byte (FLAG_ZLIB), the run's wall-clock
+start time as a little-endian double, then a stream of records. With FLAG_ZLIB
+the record stream is one zlib stream, sync-flushed now and then so that a
+capture cut short by a crash still decodes up to the last flush.
+
+Record: <d t><H step><I length><length bytes of UTF-8 text>
+  t      seconds since the capture started (monotonic clock)
+  step   step number that printed the text, 0 for the runner's own messages
+
+CLI: python -m modules.capture dump FILE
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from modules.profile_manager import get_config_dir
+
+CAPTURE_DIR = get_config_dir() / "captures"
+MAGIC = b"FPCAP01\n"
+FLAG_ZLIB = 1
+_HEADER = struct.Struct("<Bd")
+_RECORD = struct.Struct("<dHI")
+FLUSH_BYTES = 256 * 1024  # buffered record bytes before a write (and zlib sync)
+FLUSH_SECONDS = 2.0  # ...or after this long
+
+
+def capture_path(profile_name):
+    """
+    Timestamped capture file for a new run of profile_name. The file is created
+    here, exclusively, so runs started within the same second (also from the
+    daemon and the window at once) get their own "-2", "-3", ... file instead
+    of overwriting each other.
+    """
+    CAPTURE_DIR.mkdir(parents=True, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in profile_name)
+    stem = f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}"
+    n = 1
+    while True:
+        path = CAPTURE_DIR / (f"{stem}.fpcap" if n == 1 else f"{stem}-{n}.fpcap")
+        try:
+            open(path, "xb").close()
+            return path
+        except FileExistsError:
+            n += 1
+
+
+class CaptureWriter:
+    """
+    Appends (time, step, text) records to a capture file. record() is safe to
+    call from several reader threads; records are buffered and written in
+    batches so capturing costs little even for very chatty steps.
+    """
+
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+        self.closed = False
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = self.start
+        self._zlib = zlib.compressobj(6) if compress else None
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(_HEADER.pack(FLAG_ZLIB if compress else 0, time.time()))
+
+    def record(self, step, text):
+        data = text.encode("utf-8", errors="replace")
+        with self.lock:
+            if self.closed:
+                return
+            now = time.monotonic()
+            self._buffer.append(_RECORD.pack(now - self.start, step, len(data)))
+            self._buffer.append(data)
+            self._buffered += _RECORD.size + len(data)
+            if self._buffered >= FLUSH_BYTES or now - self._last_flush >= FLUSH_SECONDS:
+                self._flush(now)
+
+    def _flush(self, now):
+        chunk = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        self._last_flush = now
+        if self._zlib is not None:
+            chunk = self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        self._file.write(chunk)
+        self._file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._flush(time.monotonic())
+            if self._zlib is not None:
+                self._file.write(self._zlib.flush())
+            self._file.close()
+
+
+def read_capture(path):
+    """
+    Yield (t, step, text) records from a capture file. A truncated tail (the
+    run or the launcher died mid-write) ends the iteration quietly.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a FluxPilot capture")
+        flags, _ = _HEADER.unpack(f.read(_HEADER.size))
+        inflate = zlib.decompressobj() if flags & FLAG_ZLIB else None
+        pending = b""
+        while True:
+            raw = f.read(1024 * 1024)
+            if not raw:
+                break
+            if inflate is not None:
+                try:
+                    raw = inflate.decompress(raw)
+                except zlib.error:
+                    break
+            pending += raw
+            pos = 0
+            while len(pending) - pos >= _RECORD.size:
+                t, step, length = _RECORD.unpack_from(pending, pos)
+                end = pos + _RECORD.size + length
+                if end > len(pending):
+                    break
+                yield t, step, pending[pos + _RECORD.size : end].decode(
+                    "utf-8", errors="replace"
+                )
+                pos = end
+            pending = pending[pos:]
+
+
+class CaptureReplayer:
+    """
+    Plays a capture back into an output callback, with the ProcessRunner
+    interface the launcher expects from a run. speed is a multiplier of the
+    recorded pace (1 = real time); None replays as fast as possible. With
+    annotate, every line is prefixed with its time offset and step number.
+    """
+
+    def __init__(self, path, on_output, on_finish=None, speed=1.0, annotate=True):
+        self.path = path
+        self.on_output = on_output
+        self.on_finish = on_finish
+        self.speed = speed
+        self.annotate = annotate
+        self.profile_name = f"replay {os.path.basename(str(path))}"
+        self.is_running = False
+        self.launching = False
+        self.total_steps = 0
+        self._stop = threading.Event()  # wakes a replay sleeping through a gap
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        threading.Thread(
+            target=self._replay, name="fluxpilot-replay", daemon=True
+        ).start()
+
+    def _replay(self):
+        started = time.monotonic()
+        count = 0
+        at_line_start = True
+        try:
+            for t, step, text in read_capture(self.path):
+                if not self.is_running:
+                    break
+                if self.speed:
+                    delay = started + t / self.speed - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                if self.annotate and at_line_start:
+                    tag = f"step {step}" if step else "runner"
+                    text = f"[{t:9.3f}s {tag}] {text}"
+                at_line_start = text.endswith(("\n", "\r"))
+                self.on_output(text)
+                count += 1
+        except (OSError, ValueError) as e:
+            self.on_output(f"\n‼ Could not replay capture: {e}\n")
+        elapsed = time.monotonic() - started
+        self.on_output(f"\n[replayed {count:,} records in {elapsed:.2f} s]\n")
+        self.is_running = False
+        if self.on_finish:
+            self.on_finish()
+
+    def pids(self):
+        return []
+
+    def active_step_count(self):
+        return 0
+
+    def stop_all(self):
+        self.is_running = False
+        self._stop.set()
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 2 or args[0] != "dump":
+        print("usage: python -m modules.capture dump FILE")
+        return 2
+    for t, step, text in read_capture(args[1]):
+        tag = f"step {step}" if step else "runner"
+        sys.stdout.write(f"[{t:9.3f}s {tag}] {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import collections
+import threading
+
+from modules.ansi import CR, AnsiParser
+
+DRAIN_INTERVAL_MS = 50  # how often queued output is applied to the widget
+MAX_SEGMENTS_PER_DRAIN = 5000  # keeps one drain tick short under heavy output
+MAX_TAGS = 128  # bounded style-tag cache per console
+
+
+class ConsoleView:
+    """
+    Thread-safe front for a run's CTkTextbox that renders ANSI colors.
+
+    write() may be called from any thread: the text is parsed into styled
+    segments right there (on the reader thread, not the Tk thread) and queued.
+    The Tk thread drains the queue every DRAIN_INTERVAL_MS, merging consecutive
+    segments with the same style into a single insert and interning each distinct
+    style as one Tk tag. Tags live in a small LRU cache; when it is full the least
+    recently used style's tag is deleted, so its old text falls back to the
+    default color instead of tags piling up over a long session.
+
+    Steps write concurrently, so a carriage return only redraws the last line if
+    the same producer (thread) wrote that line; text from a producer other than
+    the one whose line is still open starts on a new line. A progress bar in one
+    step thus never erases or joins log lines of another.
+    """
+
+    def __init__(self, textbox):
+        self.textbox = textbox
+        self.queue = collections.deque()  # (text, style, producer), thread-safe
+        self.tags = collections.OrderedDict()  # style -> tag name, in LRU order
+        self.tag_counter = 0
+        self._parsers = threading.local()  # one parser per producing thread
+        self._line_owner = None  # producer of the unterminated last line, if any
+        self._cr_owner = None  # producer whose CR asks to redraw its line
+        self.textbox.configure(state="disabled")
+        self.textbox.after(DRAIN_INTERVAL_MS, self._drain)
+
+    def write(self, text):
+        """Queue output for display. Safe to call from any thread."""
+        parser = getattr(self._parsers, "parser", None)
+        if parser is None:
+            parser = self._parsers.parser = AnsiParser()
+        self.queue.extend(
+            (seg_text, style, parser) for seg_text, style in parser.feed(text)
+        )
+
+    def _drain(self):
+        """Tk thread: apply queued segments in one batch, then reschedule."""
+        if not self.textbox.winfo_exists():
+            return
+        if self.queue:
+            batch = []
+            for _ in range(min(len(self.queue), MAX_SEGMENTS_PER_DRAIN)):
+                batch.append(self.queue.popleft())
+            self._apply(batch)
+        self.textbox.after(DRAIN_INTERVAL_MS, self._drain)
+
+    def _apply(self, batch):
+        self.textbox.configure(state="normal")
+        text, style = "", None
+        for seg_text, seg_style, producer in batch:
+            if seg_text == CR:
+                self._cr_owner = producer
+                continue
+            if self._line_owner is not None and self._line_owner is not producer:
+                text += "\n"  # another producer's line is still open
+            elif self._cr_owner is producer and self._line_owner is producer:
+                self._insert(text, style)
+                text = ""
+                self.textbox.delete("end-1c linestart", "end-1c")
+            if self._cr_owner is producer:
+                self._cr_owner = None
+            self._line_owner = None if seg_text.endswith("\n") else producer
+            if seg_style != style:
+                self._insert(text, style)
+                text, style = "", seg_style
+            text += seg_text
+        self._insert(text, style)
+        self.textbox.see("end")
+        self.textbox.configure(state="disabled")
+
+    def _insert(self, text, style):
+        if text:
+            self.textbox.insert("end", text, self._tag_for(style))
+
+    def _tag_for(self, style):
+        """Return the interned tag for a style (None for the default style)."""
+        if style is None:
+            return None
+        tag = self.tags.get(style)
+        if tag is not None:
+            self.tags.move_to_end(style)
+            return tag
+        if len(self.tags) >= MAX_TAGS:
+            _, old_tag = self.tags.popitem(last=False)
+            self.textbox.tag_delete(old_tag)
+        tag = f"ansi{self.tag_counter}"
+        self.tag_counter += 1
+        fg, bg, bold, underline, inverse = style
+        if bold and fg is None:
+            fg = "#ffffff"  # terminals render plain bold as bright white
+        if inverse:
+            fg, bg = bg or "#1d1e1e", fg or "#dce4ee"
+        options = {}
+        if fg:
+            options["foreground"] = fg
+        if bg:
+            options["background"] = bg
+        if underline:
+            options["underline"] = True
+        self.textbox.tag_config(tag, **options)
+        self.tags[style] = tag
+        return tag
@@ -0,0 +1,666 @@
+"""
+FluxPilot background daemon.
+
+The daemon owns the ProcessRunners so runs survive GUI restarts, keeps a bounded
+scrollback per run, and serves any number of clients over a local Unix socket.
+The protocol is newline-delimited JSON, one request per connection:
+
+  {"op": "ping"}                              -> {"ok": true, "pid": int}
+  {"op": "start", "profile": {...}, "env": {...}}
+                                              -> {"ok": true, "run_id": str}
+  {"op": "stop", "run_id": str}               -> {"ok": true}
+  {"op": "forget", "run_id": str}             -> {"ok": true}
+  {"op": "list"}                              -> {"ok": true, "runs": [status, ...]}
+  {"op": "attach", "run_id": str, "offset": int}
+      -> {"ok": true}, then a stream of
+         {"event": "output", "offset": int, "data": str}
+         {"event": "status", ...status fields...}
+         {"event": "finish"}
+  {"op": "profile", "action": "start"}        -> {"ok": true}
+  {"op": "profile", "action": "stop"}
+      -> {"ok": true, "stacks": {collapsed stack: count}, "samples": int,
+          "overhead": float}
+  {"op": "shutdown"}                          -> {"ok": true}
+
+"env" is the client's environment, which the run's steps start from instead of
+the daemon's own (that of whichever window started the daemon, maybe long ago).
+
+Offsets count characters from the start of the run's output, so a client that
+reconnects can resume exactly where it stopped (or replay everything from 0).
+
+Run `python -m modules.daemon` to serve, or `python -m modules.daemon --help` for
+the small command-line client.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import platform
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from modules.process_runner import ProcessRunner
+from modules.capture import CaptureWriter, capture_path
+from modules.profile_manager import get_config_dir, load_settings
+from modules.resource_limits import SCOPE_PREFIX, claim_cgroup
+from modules.run_history import HistoryStore
+from modules.sampling_profiler import SamplingProfiler
+
+SOCKET_PATH = get_config_dir() / "daemon.sock"
+MAX_MESSAGE_CHARS = 64 * 1024  # output is sent in chunks of at most this size
+REATTACH_ATTEMPTS = 4  # attach tries before a client gives up on a run
+REATTACH_DELAY_S = 0.5  # grows with each further attempt
+
+
+def is_supported():
+    """The daemon needs Unix domain sockets."""
+    return hasattr(socket, "AF_UNIX") and hasattr(socketserver, "UnixStreamServer")
+
+
+class DaemonRun:
+    """One run owned by the daemon: its ProcessRunner plus bounded scrollback."""
+
+    def __init__(self, run_id, profile, scrollback_chars, settings, env=None):
+        self.run_id = run_id
+        self.profile_name = profile["name"]
+        self.scrollback_chars = scrollback_chars
+        self.offsets = []  # start offset of each retained chunk
+        self.texts = []  # chunk text, parallel to offsets
+        self.head = 0  # index of the oldest retained chunk
+        self.size = 0  # characters currently retained
+        self.end = 0  # offset just past the last character written
+        self.finished = False
+        self.cond = threading.Condition()
+        self.runner = ProcessRunner(
+            profile["steps"],
+            self._on_output,
+            self._on_finish,
+            max_lines_per_sec=settings["max_lines_per_sec"],
+            spawn_workers=settings["spawn_workers"],
+        )
+        if settings["capture_runs"]:
+            try:
+                self.runner.capture = CaptureWriter(capture_path(self.profile_name))
+            except OSError:
+                pass
+        self.runner.profile_name = self.profile_name
+        self.runner.base_env = env
+
+    def _on_output(self, text):
+        with self.cond:
+            self.offsets.append(self.end)
+            self.texts.append(text)
+            self.end += len(text)
+            self.size += len(text)
+            # Trim the oldest chunks, always keeping the newest one
+            while self.size > self.scrollback_chars and self.head < len(self.texts) - 1:
+                self.size -= len(self.texts[self.head])
+                self.texts[self.head] = None
+                self.head += 1
+            if self.head > 1024 and self.head * 2 > len(self.texts):
+                del self.offsets[: self.head]
+                del self.texts[: self.head]
+                self.head = 0
+            self.cond.notify_all()
+
+    def _on_finish(self):
+        with self.cond:
+            self.finished = True
+            self.cond.notify_all()
+
+    def read_from(self, offset, limit=MAX_MESSAGE_CHARS):
+        """
+        Return (start, text) for retained output at or after offset. If the data at
+        offset has already been trimmed, start is the oldest retained offset.
+        """
+        with self.cond:
+            if self.head >= len(self.texts) or offset >= self.end:
+                return offset, ""
+            idx = max(
+                self.head, bisect.bisect_right(self.offsets, offset, self.head) - 1
+            )
+            start = max(offset, self.offsets[idx])
+            parts = []
+            total = 0
+            while idx < len(self.texts) and total < limit:
+                text = self.texts[idx]
+                skip = start - self.offsets[idx] if not parts else 0
+                part = text[skip:]
+                parts.append(part)
+                total += len(part)
+                idx += 1
+            return start, "".join(parts)
+
+    def status(self):
+        runner = self.runner
+        return {
+            "run_id": self.run_id,
+            "profile_name": self.profile_name,
+            "is_running": runner.is_running,
+            "launching": runner.launching,
+            "total_steps": runner.total_steps,
+            "active_steps": runner.active_step_count(),
+            "pids": runner.pids(),
+            "finished": self.finished,
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.server.daemon_state.client_connected()
+
+    def finish(self):
+        self.server.daemon_state.client_disconnected()
+        super().finish()
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError:
+            return
+        state = self.server.daemon_state
+        op = request.get("op")
+        try:
+            if op == "attach":
+                self._attach(state, request)
+                return
+            reply = state.dispatch(op, request)
+        except KeyError as e:
+            reply = {"ok": False, "error": f"unknown run {e}"}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        try:
+            self._send(reply)
+        except OSError:
+            pass
+
+    def _attach(self, state, request):
+        run = state.get_run(request["run_id"])
+        offset = int(request.get("offset", 0))
+        self._send({"ok": True})
+        last_status = None
+        try:
+            while True:
+                with run.cond:
+                    if run.end <= offset and not run.finished:
+                        # Time out periodically to push status changes
+                        run.cond.wait(0.5)
+                start, text = run.read_from(offset)
+                if text:
+                    self._send({"event": "output", "offset": start, "data": text})
+                    offset = start + len(text)
+                status = run.status()
+                if status != last_status:
+                    self._send(dict(status, event="status"))
+                    last_status = status
+                if run.finished and offset >= run.end:
+                    self._send({"event": "finish"})
+                    return
+        except OSError:
+            # Client went away; the run keeps going
+            return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FluxPilotDaemon:
+    """Owns every run and serves the socket protocol described in the module doc."""
+
+    def __init__(self, socket_path=SOCKET_PATH, settings=None):
+        settings = settings or load_settings()
+        self.socket_path = str(socket_path)
+        self.scrollback_chars = int(settings["daemon_scrollback_kb"]) * 1024
+        self.idle_timeout = settings["daemon_idle_timeout_s"]
+        self.settings = settings
+        self.history = HistoryStore() if settings["record_history"] else None
+        self.runs = {}  # run_id -> DaemonRun
+        self.run_counter = 0
+        self.clients = 0
+        self.last_activity = time.monotonic()
+        self.lock = threading.Lock()
+        self.server = None
+        # Samples the daemon's runner and reader threads for the window's profiler
+        self.profiler = SamplingProfiler(settings["profiler_interval_ms"] / 1000)
+
+    def client_connected(self):
+        with self.lock:
+            self.clients += 1
+            self.last_activity = time.monotonic()
+
+    def client_disconnected(self):
+        with self.lock:
+            self.clients -= 1
+            self.last_activity = time.monotonic()
+
+    def get_run(self, run_id):
+        with self.lock:
+            return self.runs[run_id]
+
+    def dispatch(self, op, request):
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "start":
+            profile = request["profile"]
+            with self.lock:
+                run_id = f"d{self.run_counter}"
+                self.run_counter += 1
+                run = DaemonRun(
+                    run_id,
+                    profile,
+                    self.scrollback_chars,
+                    self.settings,
+                    env=request.get("env"),
+                )
+                self.runs[run_id] = run
+            if self.history:
+                run.runner.on_metrics = self.history.recorder(run.profile_name)
+            run.runner.start()
+            return {"ok": True, "run_id": run_id}
+        if op == "stop":
+            self.get_run(request["run_id"]).runner.stop_all()
+            return {"ok": True}
+        if op == "forget":
+            run = self.get_run(request["run_id"])
+            run.runner.stop_all()
+            with self.lock:
+                self.runs.pop(request["run_id"], None)
+            return {"ok": True}
+        if op == "list":
+            with self.lock:
+                runs = list(self.runs.values())
+            return {"ok": True, "runs": [run.status() for run in runs]}
+        if op == "profile":
+            if request.get("action") == "start":
+                self.profiler.stop()
+                self.profiler.reset()
+                self.profiler.start()
+                return {"ok": True}
+            self.profiler.stop()
+            samples, overhead = self.profiler.stats()
+            with self.profiler.lock:
+                stacks = dict(self.profiler.stacks)
+            return {
+                "ok": True,
+                "stacks": stacks,
+                "samples": samples,
+                "overhead": overhead,
+            }
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if DaemonClient(self.socket_path).ping():
+                print("FluxPilot daemon is already running", file=sys.stderr)
+                return
+            os.unlink(self.socket_path)
+        cgroup_error = claim_cgroup()
+        if cgroup_error:
+            print(
+                f"FluxPilot daemon: no cgroup limits for steps ({cgroup_error}); "
+                "memory limits fall back to rlimits",
+                file=sys.stderr,
+            )
+        old_umask = os.umask(0o077)  # socket is private to this user
+        try:
+            self.server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_state = self
+        threading.Thread(target=self._idle_watchdog, daemon=True).start()
+        try:
+            self.server.serve_forever(poll_interval=0.5)
+        finally:
+            self.server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        """Stop every run and the server."""
+        with self.lock:
+            runs = list(self.runs.values())
+        for run in runs:
+            run.runner.stop_all()
+        if self.server:
+            self.server.shutdown()
+
+    def _idle_watchdog(self):
+        """Exit once nothing has been running and no client connected for a while."""
+        if not self.idle_timeout:
+            return
+        while True:
+            time.sleep(5)
+            with self.lock:
+                busy = self.clients > 0 or any(
+                    run.runner.is_running for run in self.runs.values()
+                )
+                if busy:
+                    self.last_activity = time.monotonic()
+                idle_for = time.monotonic() - self.last_activity
+            if idle_for >= self.idle_timeout:
+                self.server.shutdown()
+                return
+
+
+class DaemonClient:
+    """Talks to the daemon; every request uses its own short-lived connection."""
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=5):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def request(self, op, **fields):
+        """Send one request and return the decoded reply (raises OSError/ValueError)."""
+        with self._connect() as sock:
+            sock.sendall((json.dumps(dict(fields, op=op)) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as f:
+                reply = json.loads(f.readline().decode("utf-8"))
+        if not reply.get("ok"):
+            raise ValueError(reply.get("error", "daemon request failed"))
+        return reply
+
+    def ping(self):
+        try:
+            self.request("ping")
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def list_runs(self):
+        return self.request("list")["runs"]
+
+    def attach(self, run_id, offset=0):
+        """Open an attach stream; yields decoded events until the run finishes."""
+        sock = self._connect()
+        sock.settimeout(None)
+        sock.sendall(
+            (
+                json.dumps({"op": "attach", "run_id": run_id, "offset": offset}) + "\n"
+            ).encode("utf-8")
+        )
+        f = sock.makefile("rb")
+        reply = json.loads(f.readline().decode("utf-8") or "{}")
+        if not reply.get("ok"):
+            sock.close()
+            raise ValueError(reply.get("error", f"cannot attach to {run_id}"))
+        return sock, f
+
+
+def ensure_daemon(timeout=5.0):
+    """
+    Return a DaemonClient for a running daemon, starting one in the background if
+    needed. Returns None if the daemon is unsupported or could not be started.
+    """
+    if not is_supported():
+        return None
+    client = DaemonClient()
+    if client.ping():
+        return client
+    repo_dir = Path(__file__).resolve().parent.parent
+    command = [sys.executable, "-m", "modules.daemon", "serve"]
+    scoped = _scope_command(command)
+    for attempt in [scoped, command] if scoped else [command]:
+        proc = subprocess.Popen(
+            attempt,
+            cwd=str(repo_dir),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if client.ping():
+                return client
+            if proc.poll() is not None:
+                break  # e.g. no systemd user manager; try the next way
+            time.sleep(0.05)
+    return None
+
+
+def _scope_command(command):
+    """
+    command wrapped in systemd-run, so the daemon gets a delegated scope of its
+    own in which steps can have cgroup limits, or None without systemd.
+    """
+    if platform.system() != "Linux" or not shutil.which("systemd-run"):
+        return None
+    unit = f"{SCOPE_PREFIX}-{os.getpid()}-{int(time.time())}"
+    return [
+        "systemd-run",
+        "--user",
+        "--scope",
+        "--quiet",
+        "--collect",
+        "--property=Delegate=yes",
+        f"--unit={unit}",
+        "--",
+        *command,
+    ]
+
+
+class RemoteRunner:
+    """
+    Stand-in for ProcessRunner whose run lives in the daemon. It exposes the same
+    attributes and methods the launcher and LaunchScheduler use, and streams the
+    run's output to on_output from a background thread.
+    """
+
+    def __init__(self, client, profile, on_output, on_finish=None):
+        self.client = client
+        self.profile = profile
+        self.profile_name = profile["name"]
+        self.on_output = on_output
+        self.on_finish = on_finish
+        self.remote_id = None
+        self.offset = 0  # next output offset expected from the daemon
+        self.is_running = False
+        self.launching = False
+        self.total_steps = len(profile.get("steps", []))
+        self._active_steps = 0
+        self._pids = []
+        self._stream = None
+        self._detached = False  # set by detach(), tells a closed stream from a lost one
+
+    @classmethod
+    def reattach(cls, client, status, on_output, on_finish=None):
+        """Attach to a run that already exists in the daemon, replaying its output."""
+        profile = {"name": status["profile_name"], "steps": []}
+        runner = cls(client, profile, on_output, on_finish)
+        runner.remote_id = status["run_id"]
+        runner._apply_status(status)
+        runner._start_stream()
+        return runner
+
+    def start(self):
+        if self.is_running or self.remote_id is not None:
+            return
+        self.is_running = True
+        self.launching = True
+        self._active_steps = self.total_steps
+        try:
+            self.remote_id = self.client.request(
+                "start", profile=self.profile, env=dict(os.environ)
+            )["run_id"]
+        except (OSError, ValueError) as e:
+            self.is_running = False
+            self.launching = False
+            self.on_output(f"\n‼ Could not start run in the FluxPilot daemon: {e}\n")
+            if self.on_finish:
+                self.on_finish()
+            return
+        self._start_stream()
+
+    def _start_stream(self):
+        threading.Thread(
+            target=self._follow, name="fluxpilot-follow", daemon=True
+        ).start()
+
+    def _apply_status(self, status):
+        self.is_running = status["is_running"]
+        self.launching = status["launching"]
+        self.total_steps = status["total_steps"]
+        self._active_steps = status["active_steps"]
+        self._pids = status.get("pids", [])
+
+    def _follow(self):
+        """
+        Background thread: apply the daemon's event stream for this run. A stream
+        that ends without "finish" (other than through detach()) is reattached
+        from the current offset; if that keeps failing the run is given up.
+        """
+        error = None
+        for attempt in range(REATTACH_ATTEMPTS):
+            if attempt:
+                time.sleep(REATTACH_DELAY_S * attempt)
+            if self._detached:
+                return
+            try:
+                sock, f = self.client.attach(self.remote_id, self.offset)
+            except (OSError, ValueError) as e:
+                error = e
+                continue
+            self._stream = sock
+            try:
+                with sock, f:
+                    if self._read_events(f):
+                        self._finish()
+                        return
+                error = "stream closed"
+            except (OSError, ValueError) as e:
+                error = e
+            finally:
+                self._stream = None
+            if self._detached:
+                return
+        self.on_output(f"\n‼ Lost connection to the FluxPilot daemon: {error}\n")
+        self._finish()
+
+    def _read_events(self, f):
+        """Apply events from an attach stream; True once the run has finished."""
+        for raw in f:
+            event = json.loads(raw.decode("utf-8"))
+            kind = event.get("event")
+            if kind == "output":
+                if event["offset"] > self.offset:
+                    self.on_output("\n[… earlier output trimmed …]\n")
+                self.on_output(event["data"])
+                self.offset = event["offset"] + len(event["data"])
+            elif kind == "status":
+                self._apply_status(event)
+            elif kind == "finish":
+                return True
+        return False
+
+    def _finish(self):
+        self.is_running = False
+        self.launching = False
+        self._active_steps = 0
+        self._pids = []
+        if self.on_finish:
+            self.on_finish()
+
+    def active_step_count(self):
+        return self._active_steps if self.is_running else 0
+
+    def pids(self):
+        return list(self._pids) if self.is_running else []
+
+    def stop_all(self):
+        if not self.is_running or self.remote_id is None:
+            return
+        self.is_running = False
+        try:
+            self.client.request("stop", run_id=self.remote_id)
+        except (OSError, ValueError):
+            pass
+
+    def detach(self):
+        """Stop following the run without stopping it."""
+        self._detached = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def forget(self):
+        """Drop the run (and its scrollback) from the daemon."""
+        if self.remote_id is None:
+            return
+        try:
+            self.client.request("forget", run_id=self.remote_id)
+        except (OSError, ValueError):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m modules.daemon", description="FluxPilot daemon and client"
+    )
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("serve", help="run the daemon in the foreground (default)")
+    sub.add_parser("list", help="list runs owned by the daemon")
+    attach = sub.add_parser("attach", help="stream a run's output")
+    attach.add_argument("run_id")
+    attach.add_argument("--offset", type=int, default=0)
+    stop = sub.add_parser("stop", help="stop a run")
+    stop.add_argument("run_id")
+    sub.add_parser("shutdown", help="stop every run and the daemon")
+    args = parser.parse_args(argv)
+
+    if not is_supported():
+        parser.error("the FluxPilot daemon needs Unix domain sockets")
+    if args.command in (None, "serve"):
+        FluxPilotDaemon().serve_forever()
+        return
+
+    client = DaemonClient()
+    try:
+        if args.command == "list":
+            for run in client.list_runs():
+                state = "running" if run["is_running"] else "finished"
+                print(f"{run['run_id']}\t{state}\t{run['profile_name']}")
+        elif args.command == "attach":
+            sock, f = client.attach(args.run_id, args.offset)
+            with sock, f:
+                for raw in f:
+                    event = json.loads(raw.decode("utf-8"))
+                    if event.get("event") == "output":
+                        sys.stdout.write(event["data"])
+                        sys.stdout.flush()
+        elif args.command == "stop":
+            client.request("stop", run_id=args.run_id)
+        elif args.command == "shutdown":
+            client.request("shutdown")
+    except (OSError, ValueError) as e:
+        sys.exit(f"FluxPilot daemon: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import ssl
+import threading
+from urllib.parse import urlsplit
+
+# Check states, worst last
+PENDING = "pending"
+UP = "up"
+DEGRADED = "degraded"
+DOWN = "down"
+
+DEFAULT_INTERVAL_S = 5.0
+DEFAULT_TIMEOUT_S = 2.0
+DEFAULT_DEGRADED_MS = 1000  # slower successful checks count as degraded
+DEFAULT_FAILURES_DOWN = 3  # consecutive failures before a check is down
+MAX_HEADER_LINES = 100
+
+
+def parse_check(step):
+    """
+    Normalize a step's optional "health_check" into a spec dict, or None.
+
+    {"url": "http://localhost:3000/health"}  HTTP(S) GET, 2xx/3xx is healthy
+    {"tcp": "localhost:5432"}                 TCP connect
+    Optional: interval_s, timeout_s, degraded_ms, failures_down.
+    Raises ValueError for an unusable definition.
+    """
+    check = step.get("health_check")
+    if not check:
+        return None
+    spec = {
+        "interval_s": float(check.get("interval_s", DEFAULT_INTERVAL_S)),
+        "timeout_s": float(check.get("timeout_s", DEFAULT_TIMEOUT_S)),
+        "degraded_ms": float(check.get("degraded_ms", DEFAULT_DEGRADED_MS)),
+        "failures_down": int(check.get("failures_down", DEFAULT_FAILURES_DOWN)),
+    }
+    if check.get("url"):
+        url = urlsplit(check["url"])
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"unsupported health check URL {check['url']!r}")
+        spec.update(
+            kind="http",
+            host=url.hostname,
+            port=url.port or (443 if url.scheme == "https" else 80),
+            tls=url.scheme == "https",
+            path=(url.path or "/") + (f"?{url.query}" if url.query else ""),
+            netloc=url.netloc,
+        )
+    elif check.get("tcp"):
+        host, _, port = str(check["tcp"]).rpartition(":")
+        if not port.isdigit():
+            raise ValueError(f"health check tcp needs host:port, got {check['tcp']!r}")
+        spec.update(kind="tcp", host=host or "localhost", port=int(port))
+    else:
+        raise ValueError("health_check needs a 'url' or 'tcp' entry")
+    return spec
+
+
+class _HttpConnection:
+    """
+    One keep-alive HTTP/1.1 connection per check. The connection is reused
+    across checks as long as the server keeps it open and every response body
+    was fully read; otherwise the next check opens a fresh one.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def get(self):
+        """Perform one GET and return the status code."""
+        reused = self.writer is not None and not self.writer.is_closing()
+        try:
+            return await self._get()
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            if not reused:
+                raise
+        # The server dropped an idle keep-alive connection; retry once on a new one
+        return await self._get()
+
+    async def _get(self):
+        spec = self.spec
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(
+                spec["host"],
+                spec["port"],
+                ssl=ssl.create_default_context() if spec["tls"] else None,
+            )
+        self.writer.write(
+            f"GET {spec['path']} HTTP/1.1\r\nHost: {spec['netloc']}\r\n"
+            "User-Agent: FluxPilot-health\r\nConnection: keep-alive\r\n\r\n".encode(
+                "latin-1"
+            )
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise ValueError("malformed HTTP response")
+        status = int(parts[1])
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get("connection") != "close" and parts[0] != b"HTTP/1.0"
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)  # chunk data + CRLF
+                if size == 0:
+                    break
+        elif "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        elif status not in (204, 304):
+            keep_alive = False  # body runs until the server closes
+        if not keep_alive:
+            self.close()
+        return status
+
+
+class HealthChecker:
+    """
+    Runs every step health check of every run on one shared asyncio loop in a
+    single background thread. Each check is a coroutine that sleeps between
+    probes, so hundreds of checks cost next to nothing while idle. Results are
+    read from any thread with result(key).
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.results = {}  # key -> latest result dict (replaced, never mutated)
+        self._tasks = {}  # key -> asyncio.Task, only touched on the loop thread
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.loop.run_forever, name="fluxpilot-health", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def add(self, key, spec):
+        """Start checking spec under key (replacing an existing check)."""
+        self.results[key] = {"state": PENDING, "latency_ms": None, "error": None}
+        self.loop.call_soon_threadsafe(self._add, key, spec)
+
+    def remove(self, key):
+        self.results.pop(key, None)
+        self.loop.call_soon_threadsafe(self._remove, key)
+
+    def result(self, key):
+        return self.results.get(key)
+
+    def _add(self, key, spec):
+        self._remove(key)
+        self._tasks[key] = self.loop.create_task(self._run(key, spec))
+
+    def _remove(self, key):
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _run(self, key, spec):
+        conn = _HttpConnection(spec) if spec["kind"] == "http" else None
+        failures = 0
+        ever_up = False
+        # Spread the first probes so many checks don't fire in lockstep
+        await asyncio.sleep(random.uniform(0, min(spec["interval_s"], 1.0)))
+        try:
+            while True:
+                started = self.loop.time()
+                error = None
+                try:
+                    if conn is not None:
+                        status = await asyncio.wait_for(conn.get(), spec["timeout_s"])
+                        if status >= 400:
+                            error = f"HTTP {status}"
+                    else:
+                        _, writer = await asyncio.wait_for(
+                            asyncio.open_connection(spec["host"], spec["port"]),
+                            spec["timeout_s"],
+                        )
+                        writer.close()
+                except asyncio.TimeoutError:
+                    error = "timeout"
+                    if conn is not None:
+                        conn.close()
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    error = str(e) or type(e).__name__
+                latency_ms = (self.loop.time() - started) * 1000
+
+                if error is None:
+                    failures = 0
+                    ever_up = True
+                    slow = latency_ms > spec["degraded_ms"]
+                    state = DEGRADED if slow else UP
+                else:
+                    failures += 1
+                    if failures >= spec["failures_down"]:
+                        state = DOWN
+                    else:
+                        state = DEGRADED if ever_up else PENDING
+                if key in self.results:
+                    self.results[key] = {
+                        "state": state,
+                        "latency_ms": None if error else latency_ms,
+                        "error": error,
+                    }
+                await asyncio.sleep(
+                    max(0.0, spec["interval_s"] - (self.loop.time() - started))
+                )
+        finally:
+            if conn is not None:
+                conn.close()
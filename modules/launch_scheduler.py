@@ -0,0 +1,131 @@
+import threading
+
+import psutil
+
+# Per-run states reported by the scheduler
+QUEUED = "queued"
+STARTING = "starting"
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+
+
+class LaunchScheduler:
+    """
+    Global launch queue shared by every run in the launcher.
+
+    Runs are submitted with their ProcessRunner and started in FIFO order while the
+    number of starting/running steps stays under max_steps and, optionally, while
+    the machine has CPU headroom. Everything else waits in the queue until pump()
+    finds room for it.
+
+    Admission is per run, not per step: a run starts with all of its steps or
+    not at all, since its steps are usually services meant to run side by side.
+    So max_steps is not a hard ceiling. A run with more steps than max_steps is
+    let in (alone, once nothing else is active) rather than never starting, and
+    then exceeds the cap by its own size.
+    """
+
+    def __init__(self, max_steps=16, max_load_per_cpu=None, max_cpu_percent=None):
+        """
+        max_steps: cap on steps starting or running at once across all runs,
+                   enforced per run (see above)
+        max_load_per_cpu: optional 1-minute load average per CPU ceiling
+        max_cpu_percent: optional system-wide CPU utilisation ceiling (0-100)
+        """
+        self.max_steps = max_steps
+        self.max_load_per_cpu = max_load_per_cpu
+        self.max_cpu_percent = max_cpu_percent
+        self.runners = {}  # run_id -> ProcessRunner
+        self.queue = []  # run_ids waiting to start, oldest first
+        self.cancelled = set()
+        self.lock = threading.Lock()
+        if max_cpu_percent is not None:
+            # Prime psutil so the first real reading covers a meaningful interval
+            psutil.cpu_percent(interval=None)
+
+    def submit(self, run_id, runner):
+        """Queue a run and start it right away if there is room."""
+        with self.lock:
+            self.runners[run_id] = runner
+            self.queue.append(run_id)
+        self.pump()
+
+    def adopt(self, run_id, runner):
+        """Track a run that was started elsewhere so it counts against capacity."""
+        with self.lock:
+            self.runners[run_id] = runner
+
+    def cancel(self, run_id):
+        """Drop a run from the queue. Returns True if it had not started yet."""
+        with self.lock:
+            if run_id not in self.queue:
+                return False
+            self.queue.remove(run_id)
+            self.cancelled.add(run_id)
+            return True
+
+    def forget(self, run_id):
+        """Stop tracking a run (e.g. once its tab is closed)."""
+        with self.lock:
+            if run_id in self.queue:
+                self.queue.remove(run_id)
+            self.runners.pop(run_id, None)
+            self.cancelled.discard(run_id)
+
+    def state(self, run_id):
+        """Return the scheduler state of a run (one of the module constants)."""
+        with self.lock:
+            if run_id in self.cancelled:
+                return CANCELLED
+            if run_id in self.queue:
+                return QUEUED
+            runner = self.runners.get(run_id)
+        if runner is None or not runner.is_running:
+            return FINISHED
+        return STARTING if runner.launching else RUNNING
+
+    def active_steps(self):
+        """Number of steps currently starting or running across all runs."""
+        with self.lock:
+            started = [r for rid, r in self.runners.items() if rid not in self.queue]
+        return sum(r.active_step_count() for r in started)
+
+    def pump(self):
+        """
+        Start queued runs while capacity allows. Returns the list of run_ids that
+        were started. Safe to call as often as needed; the launcher calls it on a
+        timer so waiting runs pick up capacity freed by finished ones.
+        """
+        started = []
+        while True:
+            with self.lock:
+                if not self.queue:
+                    break
+                run_id = self.queue[0]
+                runner = self.runners[run_id]
+            active = self.active_steps()
+            # A run larger than the cap may still start on its own, otherwise it
+            # would wait forever.
+            if active and active + runner.total_steps > self.max_steps:
+                break
+            if not self._has_cpu_headroom():
+                break
+            with self.lock:
+                if not self.queue or self.queue[0] != run_id:
+                    continue
+                self.queue.pop(0)
+            runner.start()
+            started.append(run_id)
+        return started
+
+    def _has_cpu_headroom(self):
+        """Check the optional load-average and CPU utilisation ceilings."""
+        if self.max_load_per_cpu is not None:
+            load1 = psutil.getloadavg()[0]
+            if load1 / (psutil.cpu_count() or 1) >= self.max_load_per_cpu:
+                return False
+        if self.max_cpu_percent is not None:
+            if psutil.cpu_percent(interval=None) >= self.max_cpu_percent:
+                return False
+        return True
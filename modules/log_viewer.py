@@ -0,0 +1,322 @@
+import mmap
+import os
+import re
+import threading
+import customtkinter as ctk
+from tkinter import messagebox
+
+from modules.ansi import CR, AnsiParser
+
+INDEX_STRIDE = 4096  # record the byte offset of every Nth line
+SCAN_BLOCK = 4 * 1024 * 1024  # bytes counted per step while indexing
+MAX_LINE_CHARS = 10000  # very long lines are cut when displayed
+
+# Leading timestamps we can jump to: "2024-05-01 12:34:56", ISO "T" form, or
+# a bare "12:34:56" clock time
+_TIMESTAMP_RE = re.compile(rb"(\d{4}-\d{2}-\d{2}[T ])?(\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)")
+
+
+def _timestamp_key(raw, with_date=True):
+    """
+    Comparable string for the timestamp near the start of raw bytes, or None.
+    with_date=False compares clock times only (for targets given without a date).
+    """
+    match = _TIMESTAMP_RE.search(raw[:64])
+    if not match:
+        return None
+    clock = match.group(2).decode("ascii").replace(",", ".")
+    if not with_date:
+        return clock
+    return (match.group(1) or b"").decode("ascii").replace("T", " ") + clock
+
+
+class LineIndex:
+    """
+    Sparse line index over a memory-mapped file.
+
+    The file is mapped read-only, so opening it costs nothing up front. A
+    background thread counts newlines a block at a time and records the offset
+    of every INDEX_STRIDE-th line; any line is then found by seeking to the
+    nearest checkpoint and scanning at most INDEX_STRIDE lines forward.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, "rb")
+        self.mm = None
+        if self.size:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.checkpoints = [0]  # byte offset of line k * INDEX_STRIDE
+        self.line_count = 0  # lines indexed so far
+        self.complete = self.mm is None
+        self._stop = False
+        if not self.complete:
+            threading.Thread(
+                target=self._build, name="fluxpilot-log-index", daemon=True
+            ).start()
+
+    def close(self):
+        self._stop = True
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self._file.close()
+
+    def _build(self):
+        """Background thread: count lines and record sparse checkpoints."""
+        mm = self.mm
+        pos = 0
+        lines = 0
+        next_checkpoint = INDEX_STRIDE
+        try:
+            while pos < self.size and not self._stop:
+                end = min(pos + SCAN_BLOCK, self.size)
+                count = mm[pos:end].count(b"\n")
+                # Locate the exact offsets of checkpoints inside this block
+                while lines + count >= next_checkpoint:
+                    offset = pos
+                    for _ in range(next_checkpoint - lines):
+                        offset = mm.find(b"\n", offset, end) + 1
+                    self.checkpoints.append(offset)
+                    count -= next_checkpoint - lines
+                    lines = next_checkpoint
+                    pos = offset
+                    next_checkpoint += INDEX_STRIDE
+                lines += count
+                self.line_count = lines
+                pos = end
+            if not self._stop:
+                # A final line without a trailing newline still counts
+                if self.size and mm[self.size - 1 : self.size] != b"\n":
+                    lines += 1
+                self.line_count = lines
+                self.complete = True
+        except (ValueError, OSError):
+            # File was closed while indexing
+            pass
+
+    def line_offset(self, line):
+        """Byte offset where a (0-based) line starts, or None past the index."""
+        if self.mm is None:
+            return 0 if line == 0 else None
+        checkpoint = line // INDEX_STRIDE
+        if checkpoint >= len(self.checkpoints):
+            return None
+        offset = self.checkpoints[checkpoint]
+        for _ in range(line - checkpoint * INDEX_STRIDE):
+            found = self.mm.find(b"\n", offset)
+            if found == -1:
+                return None
+            offset = found + 1
+        return offset
+
+    def read_lines(self, first, count):
+        """Return up to count lines starting at line first, as raw bytes each."""
+        offset = self.line_offset(first)
+        if offset is None:
+            return []
+        lines = []
+        while len(lines) < count and offset < self.size:
+            end = self.mm.find(b"\n", offset)
+            if end == -1:
+                end = self.size
+            lines.append(self.mm[offset : min(end, offset + MAX_LINE_CHARS)])
+            offset = end + 1
+        return lines
+
+    def find_timestamp(self, target):
+        """
+        First line whose leading timestamp is >= target (a timestamp string), by
+        binary search over the checkpoints indexed so far. Assumes the log is in
+        chronological order. Returns a line number or None.
+        """
+        raw_target = target.encode("ascii", "ignore")
+        match = _TIMESTAMP_RE.search(raw_target)
+        if match is None or self.mm is None:
+            return None
+        # Compare like with like when the user gives only a clock time
+        with_date = match.group(1) is not None
+        key = _timestamp_key(raw_target, with_date)
+
+        def key_at(offset):
+            for _ in range(100):  # skip lines without a timestamp
+                end = self.mm.find(b"\n", offset)
+                raw = self.mm[offset : end if end != -1 else self.size]
+                found = _timestamp_key(raw, with_date)
+                if found is not None or end == -1:
+                    return found
+                offset = end + 1
+            return None
+
+        lo, hi = 0, len(self.checkpoints) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            found = key_at(self.checkpoints[mid])
+            if found is not None and found <= key:
+                lo = mid
+            else:
+                hi = mid - 1
+        line = lo * INDEX_STRIDE
+        for raw in self.read_lines(line, INDEX_STRIDE * 2):
+            found = _timestamp_key(raw, with_date)
+            if found is not None and found >= key:
+                return line
+            line += 1
+        return None
+
+
+class LogViewer(ctk.CTkToplevel):
+    """
+    Window for browsing very large log files. Only the visible lines are read from
+    the memory-mapped file and put into the text widget.
+    """
+
+    def __init__(self, master, path):
+        super().__init__(master)
+        self.title(f"Log Viewer - {os.path.basename(path)}")
+        self.geometry("1000x650")
+        self.resizable(True, True)
+        self.index = LineIndex(path)
+        self.top_line = 0
+        self.font = ctk.CTkFont(family="Consolas", size=12)
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        # Navigation bar
+        nav = ctk.CTkFrame(self, fg_color="transparent")
+        nav.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 5))
+        nav.grid_columnconfigure(6, weight=1)
+
+        ctk.CTkLabel(nav, text="Line:").grid(row=0, column=0, padx=(0, 5))
+        self.line_var = ctk.StringVar()
+        line_entry = ctk.CTkEntry(nav, textvariable=self.line_var, width=110)
+        line_entry.grid(row=0, column=1)
+        line_entry.bind("<Return>", lambda e: self._goto_line())
+        ctk.CTkButton(nav, text="Go", width=40, command=self._goto_line).grid(
+            row=0, column=2, padx=(5, 15)
+        )
+
+        ctk.CTkLabel(nav, text="Time:").grid(row=0, column=3, padx=(0, 5))
+        self.time_entry = ctk.CTkEntry(
+            nav, width=170, placeholder_text="2024-05-01 12:34:56"
+        )
+        self.time_entry.grid(row=0, column=4)
+        self.time_entry.bind("<Return>", lambda e: self._goto_time())
+        ctk.CTkButton(nav, text="Go", width=40, command=self._goto_time).grid(
+            row=0, column=5, padx=5
+        )
+
+        self.status_label = ctk.CTkLabel(nav, text="", text_color="gray")
+        self.status_label.grid(row=0, column=6, sticky="e")
+
+        # Text area without its own scrollbars; the scrollbar below is virtual
+        self.text = ctk.CTkTextbox(
+            self, wrap="none", font=self.font, activate_scrollbars=False
+        )
+        self.text.grid(row=1, column=0, sticky="nsew", padx=(10, 0), pady=5)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 10), pady=5)
+
+        self.text.bind("<MouseWheel>", self._on_wheel)
+        self.text.bind("<Button-4>", lambda e: self._scroll_lines(-3))
+        self.text.bind("<Button-5>", lambda e: self._scroll_lines(3))
+        self.bind("<Prior>", lambda e: self._scroll_lines(-self._visible_lines()))
+        self.bind("<Next>", lambda e: self._scroll_lines(self._visible_lines()))
+        self.text.bind("<Configure>", lambda e: self._render())
+
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._render()
+        self._poll_index()
+
+    def _visible_lines(self):
+        height = self.text.winfo_height()
+        return max(1, int(height / max(1, self.font.metrics("linespace"))))
+
+    def _total_lines(self):
+        return max(1, self.index.line_count)
+
+    def _render(self):
+        """Page the visible lines out of the mapped file into the widget."""
+        visible = self._visible_lines()
+        self.top_line = max(0, min(self.top_line, self._total_lines() - visible))
+        raw_lines = self.index.read_lines(self.top_line, visible)
+        parser = AnsiParser()
+        rendered = []
+        for raw in raw_lines:
+            segments = parser.feed(raw.decode("utf-8", errors="replace"))
+            rendered.append("".join(t for t, _ in segments if t != CR).rstrip("\r"))
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(rendered))
+        self.text.configure(state="disabled")
+
+        total = self._total_lines()
+        self.scrollbar.set(self.top_line / total, (self.top_line + visible) / total)
+        self._update_status()
+
+    def _update_status(self):
+        total = self.index.line_count
+        shown = f"lines {self.top_line + 1:,}-{self.top_line + self._visible_lines():,}"
+        if self.index.complete:
+            self.status_label.configure(text=f"{shown} of {total:,}")
+        else:
+            done = 0
+            if self.index.size:
+                done = self.index.checkpoints[-1] * 100 // self.index.size
+            self.status_label.configure(
+                text=f"{shown} — indexing… {total:,} lines ({done}%)"
+            )
+
+    def _poll_index(self):
+        """Refresh the scrollbar while the background index grows."""
+        if not self.winfo_exists():
+            return
+        self._render()
+        if not self.index.complete:
+            self.after(250, self._poll_index)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top_line = int(float(args[1]) * self._total_lines())
+            self._render()
+        elif args[0] == "scroll":
+            step = self._visible_lines() if args[2] == "pages" else 1
+            self._scroll_lines(int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        self._scroll_lines(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _scroll_lines(self, delta):
+        self.top_line += delta
+        self._render()
+        return "break"
+
+    def _goto_line(self):
+        value = self.line_var.get().replace(",", "").strip()
+        if not value.isdigit():
+            messagebox.showerror("Error", "Enter a line number.", parent=self)
+            return
+        line = int(value) - 1
+        if line >= self.index.line_count and not self.index.complete:
+            messagebox.showinfo(
+                "Info", "That line has not been indexed yet.", parent=self
+            )
+        self.top_line = max(0, line)
+        self._render()
+
+    def _goto_time(self):
+        line = self.index.find_timestamp(self.time_entry.get().strip())
+        if line is None:
+            messagebox.showinfo(
+                "Info", "No line at or after that timestamp was found.", parent=self
+            )
+            return
+        self.top_line = line
+        self._render()
+
+    def _on_close(self):
+        self.index.close()
+        self.destroy()
@@ -0,0 +1,155 @@
+import threading
+import time
+import psutil
+
+from modules.ports_checker import gather_port_entries
+
+
+def entry_port(entry):
+    """Port number of an entry's local address as a string ("" if unknown)."""
+    local = entry.get("local_address", "")
+    return local.rsplit(":", 1)[-1] if ":" in local else ""
+
+
+def ports_for_pids(entries, pids):
+    """
+    Sorted ports from entries owned by any of pids or their descendants (the
+    listener is usually a child of the shell or runtime the launcher spawned).
+    """
+    tree = set()
+    for pid in pids:
+        tree.add(str(pid))
+        try:
+            tree.update(
+                str(c.pid) for c in psutil.Process(pid).children(recursive=True)
+            )
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    ports = {entry_port(e) for e in entries if e.get("pid") in tree}
+    ports.discard("")
+    return sorted(ports, key=lambda p: int(p) if p.isdigit() else 0)
+
+
+def _entry_key(entry):
+    return (
+        entry.get("pid", ""),
+        entry.get("proto", ""),
+        entry.get("local_address", ""),
+    )
+
+
+class PortMonitor:
+    """
+    Single shared scanner of listening ports for the whole launcher.
+
+    A background thread runs gather_port_entries() on an adaptive interval: every
+    fast_interval seconds while any consumer holds a boost (e.g. the ports popup
+    is open), every idle_interval seconds otherwise. Consumers read the latest
+    snapshot from the cache instead of scanning themselves, and can subscribe to
+    diff events {"opened": [entry, ...], "closed": [entry, ...]} describing which
+    PIDs started or stopped listening. Subscribers are called on the monitor
+    thread, so UI code must hand the work over to the Tk thread.
+    """
+
+    def __init__(self, fast_interval=1.0, idle_interval=10.0, ttl=None):
+        """
+        fast_interval: seconds between scans while boosted
+        idle_interval: seconds between scans otherwise
+        ttl: snapshot age after which snapshot() asks for an early rescan
+             (defaults to idle_interval)
+        """
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.ttl = ttl if ttl is not None else idle_interval
+        self.entries = []
+        self.scanned_at = None  # time.monotonic() of the last completed scan
+        self.subscribers = []
+        self.boosts = 0
+        self.lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="fluxpilot-ports", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop:
+            self._scan()
+            with self.lock:
+                interval = self.fast_interval if self.boosts else self.idle_interval
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def _scan(self):
+        entries = gather_port_entries()
+        with self.lock:
+            old = {_entry_key(e): e for e in self.entries}
+            new = {_entry_key(e): e for e in entries}
+            opened = [e for k, e in new.items() if k not in old]
+            closed = [e for k, e in old.items() if k not in new]
+            self.entries = entries
+            self.scanned_at = time.monotonic()
+            subscribers = list(self.subscribers)
+        if opened or closed:
+            event = {"opened": opened, "closed": closed}
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    pass
+
+    def snapshot(self):
+        """
+        Return (entries, age_seconds) from the cache without scanning. A snapshot
+        older than the TTL triggers a background rescan for the next reader.
+        age_seconds is None before the first scan has finished.
+        """
+        with self.lock:
+            entries = list(self.entries)
+            age = None
+            if self.scanned_at is not None:
+                age = time.monotonic() - self.scanned_at
+        if age is None or age > self.ttl:
+            self._wake.set()
+        return entries, age
+
+    def refresh(self):
+        """Ask for a rescan now; results arrive through subscribers."""
+        self._wake.set()
+
+    def subscribe(self, callback):
+        """Register callback(event) for port diffs. Returns an unsubscribe function."""
+        with self.lock:
+            self.subscribers.append(callback)
+
+        def unsubscribe():
+            with self.lock:
+                if callback in self.subscribers:
+                    self.subscribers.remove(callback)
+
+        return unsubscribe
+
+    def boost(self):
+        """Switch to fast scanning until the returned release function is called."""
+        with self.lock:
+            self.boosts += 1
+        self._wake.set()
+        released = []
+
+        def release():
+            if released:
+                return
+            released.append(True)
+            with self.lock:
+                self.boosts -= 1
+
+        return release
@@ -5,6 +5,20 @@ import signal
 import customtkinter as ctk
 from tkinter import ttk, messagebox
 
+COLUMNS = ("pid", "proto", "local_address", "foreign_address", "state", "program")
+INSERT_CHUNK = 500  # rows inserted per after() tick when (re)filling the table
+MAX_FILTER_CACHE = 64  # filter results kept for backspacing / re-typing
+
+
+def _sort_key(col, value):
+    """Sort key for a cell: numeric PIDs, addresses by host then numeric port."""
+    if col == "pid":
+        return int(value) if value.isdigit() else -1
+    if col in ("local_address", "foreign_address"):
+        host, _, port = value.rpartition(":")
+        return (host, int(port) if port.isdigit() else -1)
+    return value.lower()
+
 
 def gather_port_entries():
     """
@@ -131,25 +145,57 @@ def gather_port_entries():
 class PortsPopup(ctk.CTkToplevel):
     """
     Pop-up window showing listening ports/PIDs with ability to kill processes.
+    With a PortMonitor the list comes from its cache and updates live; the
+    monitor scans quickly while the popup is open.
+
+    Rows are kept in memory as (values, lowercase search text) and the table is
+    only a view of them: column headers sort that list, the filter box narrows
+    it (a query extending the previous one only searches the previous matches),
+    and the visible rows are inserted INSERT_CHUNK at a time across after()
+    ticks so thousands of sockets never freeze the window.
     """
 
-    def __init__(self, master, port_entries):
+    def __init__(self, master, port_entries, monitor=None):
         super().__init__(master)
         self.title("Open / Listening Ports")
         self.geometry("750x450")
         self.resizable(True, True)
         self.port_entries = port_entries
+        self.monitor = monitor
+        self._changed = False  # set by the monitor thread, applied on the Tk thread
+        self.rows = []  # [(values tuple, search text)] in current sort order
+        self.sort_col = None
+        self.sort_reverse = False
+        self._filter_cache = {}  # query -> matching row indices, in row order
+        self._query = ""
+        self._matches = []  # row indices shown for the current query
+        self._render_gen = 0  # bumps to abandon an in-progress chunked insert
+        self._render_done = True  # False while chunks are still being inserted
+        self._selected_keys = set()  # (pid, proto, local) kept selected on reload
 
         # Configure grid
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
 
-        # Title
+        # Title and filter
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 5))
+        top.grid_columnconfigure(1, weight=1)
         ctk.CTkLabel(
-            self,
+            top,
             text="Listening Ports and PIDs:",
             font=ctk.CTkFont(size=14, weight="bold"),
-        ).grid(row=0, column=0, sticky="nw", padx=10, pady=(10, 5))
+        ).grid(row=0, column=0, sticky="w")
+        self.count_label = ctk.CTkLabel(top, text="", text_color="gray")
+        self.count_label.grid(row=0, column=1, sticky="e", padx=10)
+        self.filter_var = ctk.StringVar()
+        self.filter_var.trace_add("write", lambda *_: self._apply_filter())
+        ctk.CTkEntry(
+            top,
+            textvariable=self.filter_var,
+            width=220,
+            placeholder_text="Filter port, PID or program",
+        ).grid(row=0, column=2, sticky="e")
 
         # Main frame for treeview
         frame = ctk.CTkFrame(self)
@@ -186,27 +232,30 @@ class PortsPopup(ctk.CTkToplevel):
             foreground=[("selected", "white")],
         )
 
-        columns = (
-            "pid",
-            "proto",
-            "local_address",
-            "foreign_address",
-            "state",
-            "program",
-        )
         self.tree = ttk.Treeview(
             frame,
-            columns=columns,
+            columns=COLUMNS,
             show="headings",
             selectmode="extended",
             style="Treeview",
         )
-        for col, width, heading in zip(
-            columns,
-            [60, 60, 180, 180, 100, 140],
-            ["PID", "Proto", "Local Address", "Foreign Address", "State", "Program"],
-        ):
-            self.tree.heading(col, text=heading)
+        self.headings = dict(
+            zip(
+                COLUMNS,
+                [
+                    "PID",
+                    "Proto",
+                    "Local Address",
+                    "Foreign Address",
+                    "State",
+                    "Program",
+                ],
+            )
+        )
+        for col, width in zip(COLUMNS, [60, 60, 180, 180, 100, 140]):
+            self.tree.heading(
+                col, text=self.headings[col], command=lambda c=col: self._sort_by(c)
+            )
             self.tree.column(
                 col,
                 width=width,
@@ -249,24 +298,130 @@ class PortsPopup(ctk.CTkToplevel):
             row=0, column=2, padx=5
         )
 
+        if self.monitor:
+            self._release_boost = self.monitor.boost()
+            self._unsubscribe = self.monitor.subscribe(self._on_ports_changed)
+            self.bind("<Destroy>", self._on_destroy, add="+")
+            self._poll_changes()
+
+    def _on_ports_changed(self, event):
+        """Monitor thread: only flag the change, Tk is touched in _poll_changes."""
+        self._changed = True
+
+    def _poll_changes(self):
+        if not self.winfo_exists():
+            return
+        if self._changed:
+            self._changed = False
+            self.port_entries, _ = self.monitor.snapshot()
+            self._load_entries(self.port_entries)
+        self.after(250, self._poll_changes)
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._unsubscribe()
+            self._release_boost()
+
     def _load_entries(self, entries):
-        """Clear and insert entries into the tree."""
-        self.tree.delete(*self.tree.get_children())
+        """Rebuild the in-memory rows from entries and redraw the table."""
+        self.rows = []
         for entry in entries:
-            pid = entry.get("pid", "")
-            proto = entry.get("proto", "")
-            local = entry.get("local_address", "")
-            foreign = entry.get("foreign_address", "")
-            state = entry.get("state", "")
-            prog = entry.get("program", "")
-            self.tree.insert(
-                "", "end", values=(pid, proto, local, foreign, state, prog)
-            )
+            values = tuple(str(entry.get(col, "")) for col in COLUMNS)
+            self.rows.append((values, " ".join(values).lower()))
+        self._sort_rows()
+        self._apply_filter(force=True)
+
+    def _sort_by(self, col):
+        """Header click: sort by col, toggling the direction on repeated clicks."""
+        if self.sort_col == col:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_col, self.sort_reverse = col, False
+        for c in COLUMNS:
+            arrow = ""
+            if c == col:
+                arrow = " ▼" if self.sort_reverse else " ▲"
+            self.tree.heading(c, text=self.headings[c] + arrow)
+        self._sort_rows()
+        self._apply_filter(force=True)
+
+    def _sort_rows(self):
+        if self.sort_col is None:
+            return
+        i = COLUMNS.index(self.sort_col)
+        self.rows.sort(
+            key=lambda row: _sort_key(self.sort_col, row[0][i]),
+            reverse=self.sort_reverse,
+        )
+
+    def _apply_filter(self, force=False):
+        """
+        Recompute the visible rows for the filter text. Results are cached per
+        query; a query that extends a cached one only rescans that one's matches.
+        force drops the cache after the rows themselves changed.
+        """
+        query = self.filter_var.get().strip().lower()
+        if force:
+            self._filter_cache.clear()
+        elif query == self._query:
+            return
+        self._query = query
+        matches = self._filter_cache.get(query)
+        if matches is None:
+            base = range(len(self.rows))
+            # Longest cached query that this one extends
+            for cached in sorted(self._filter_cache, key=len, reverse=True):
+                if query.startswith(cached):
+                    base = self._filter_cache[cached]
+                    break
+            rows = self.rows
+            matches = [i for i in base if query in rows[i][1]] if query else base
+            matches = list(matches)
+            if len(self._filter_cache) >= MAX_FILTER_CACHE:
+                self._filter_cache.pop(next(iter(self._filter_cache)))
+            self._filter_cache[query] = matches
+        self._matches = matches
+        self._render()
+
+    def _render(self):
+        """Replace the table contents with the matches, a chunk per Tk tick."""
+        selected = {
+            tuple(self.tree.item(item, "values")[:3]) for item in self.tree.selection()
+        }
+        if not self._render_done:
+            # Rows of the unfinished render may not be inserted yet
+            selected |= self._selected_keys
+        self._selected_keys = selected
+        self._render_done = False
+        self._render_gen += 1
+        self.tree.delete(*self.tree.get_children())
+        self.count_label.configure(
+            text=f"{len(self._matches):,} of {len(self.rows):,} sockets"
+        )
+        self._insert_chunk(self._render_gen, 0)
+
+    def _insert_chunk(self, gen, start):
+        if gen != self._render_gen or not self.winfo_exists():
+            return  # superseded by a newer filter/sort/reload
+        end = min(start + INSERT_CHUNK, len(self._matches))
+        for i in self._matches[start:end]:
+            values = self.rows[i][0]
+            item = self.tree.insert("", "end", values=values)
+            if values[:3] in self._selected_keys:
+                self.tree.selection_add(item)
+        if end < len(self._matches):
+            self.after(1, self._insert_chunk, gen, end)
+        else:
+            self._render_done = True
 
     def _on_refresh(self):
-        """Refresh entries by re-gathering. Assumes master has a gather_port_entries method."""
-        new_entries = self.master._gather_port_entries()
-        self._load_entries(new_entries)
+        """Refresh entries: ask the monitor for a rescan, or re-gather directly."""
+        if self.monitor:
+            # Changes arrive through the subscription
+            self.monitor.refresh()
+            return
+        self.port_entries = gather_port_entries()
+        self._load_entries(self.port_entries)
 
     def _kill_selected(self):
         """Kill the selected PIDs."""
@@ -1,9 +1,25 @@
 import subprocess
 import threading
+import codecs
+import locale
 import os
 import signal
 import platform
+import re
+import shlex
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from modules.resource_limits import StepLimits, has_limits
+
+# Port readiness of steps without a ready_pattern: steps that do not listen
+# within PORT_READY_TIMEOUT_S (workers, test watchers) are no longer checked.
+# Without a PortMonitor the runner sweeps itself, backing off between sweeps.
+PORT_READY_TIMEOUT_S = 60.0
+PORT_SWEEP_MIN_S = 0.5
+PORT_SWEEP_MAX_S = 2.0
 
 
 class ProcessRunner:
@@ -12,11 +28,32 @@ class ProcessRunner:
     streaming output to a callback, and stopping all processes including child processes.
     """
 
-    def __init__(self, steps, on_output, on_finish=None):
+    def __init__(
+        self,
+        steps,
+        on_output,
+        on_finish=None,
+        max_lines_per_sec=None,
+        spawn_workers=8,
+    ):
         """
         steps: a list of dicts, each { 'label': str, 'command': str, 'cwd': str or None }
-        on_output: function(line: str) called for each stdout/stderr line
-        on_finish: optional function() called when all steps finish (or are stopped)
+               plus optional 'mode': 'shell' (default) or 'exec'. Exec steps run
+               without a shell, from 'argv' (list) or the shlex-split command
+               (on Windows the command line goes to CreateProcess unchanged).
+               Optional resource limits: see modules.resource_limits.LIMIT_KEYS.
+               Optional 'ready_pattern': regex marking the step as ready when a
+               line matches; without it the first listening port counts instead.
+               Optional 'max_lines_per_sec' overrides the runner-wide ceiling.
+               Optional 'env': {NAME: value} added to the launcher's environment
+               (precomputed by modules.profile_templates).
+        on_output: function(line: str) called for each stdout/stderr line, from
+                   reader threads; it must be thread-safe
+        on_finish: optional function() called when all steps finish (or are stopped),
+                   from the runner thread
+        max_lines_per_sec: per-step output ceiling; lines beyond it are summarized
+                   instead of forwarded (None or 0 = unlimited)
+        spawn_workers: how many steps may be spawned concurrently
         """
         self.steps = steps
         self.on_output = on_output
@@ -24,126 +61,550 @@ class ProcessRunner:
         self.processes = []  # list of subprocess.Popen objects
         self.threads = []  # list of threads streaming each process’s stdout
         self.is_running = False
-        self.current_step = 0
+        self.launching = False  # True while steps are still being spawned
+        self.current_step = 0  # highest step number the spawn pool has started
         self.total_steps = len(steps)
+        self.spawn_latencies = []  # (step number, mode, milliseconds in Popen)
+        self.spawn_workers = spawn_workers
+        self.spawn_errors = {}  # step number -> launch exception
+        self._lock = threading.Lock()  # guards processes against stop_all
+        self.limits = {}  # pid -> (step number, StepLimits) for limited steps
+        self.started_at = None  # wall-clock start time of the run
+        self.step_metrics = {}  # step number -> startup/exit metrics (see below)
+        self._step_procs = {}  # step number -> (Popen, monotonic spawn time)
+        self._killed_pids = set()  # steps still alive when stop_all killed them
+        self._ready_patterns = {}  # step number -> compiled ready_pattern
+        self.max_lines_per_sec = max_lines_per_sec
+        self._throttles = {}  # step number -> _LineThrottle for rate-limited steps
+        # Optional function(started_at, stopped, metrics list) called when the run
+        # ends, e.g. to record it in the run history
+        self.on_metrics = None
+        # Optional CaptureWriter recording every line with its time and step;
+        # closed by the runner when the run ends
+        self.capture = None
+        # Optional shared PortMonitor; when set, port readiness comes from its
+        # scans instead of the runner's own sweeps
+        self.port_monitor = None
+        # Optional environment the steps start from instead of this process's
+        # (the daemon uses the environment of the window that started the run)
+        self.base_env = None
+        self._port_watch = None  # (unsubscribe, release boost) while watching
 
     def start(self):
         """Begin execution in a background thread."""
         if self.is_running:
             return
         self.is_running = True
-        threading.Thread(target=self._run_all_steps, daemon=True).start()
+        self.launching = True
+        self.started_at = time.time()
+        threading.Thread(
+            target=self._run_all_steps, name="fluxpilot-runner", daemon=True
+        ).start()
 
     def _run_all_steps(self):
         """Internal: launch all steps in parallel, streaming output."""
-        for i, step in enumerate(self.steps):
-            if not self.is_running:
-                break
-
-            self.current_step = i + 1
-            label = step.get("label") or step.get("command")
+        # Steps are independent, so they are spawned concurrently by a small
+        # bounded pool; a step that fails to start does not stop the others.
+        launch_started = time.perf_counter()
+        workers = max(1, min(self.spawn_workers, self.total_steps))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="fluxpilot-spawn"
+        ) as pool:
+            for i, step in enumerate(self.steps):
+                pool.submit(self._launch_step, step, i + 1)
+        launch_ms = (time.perf_counter() - launch_started) * 1000
+        # Popen calls overlap and contend with each other, so their sum is not
+        # what a sequential launch would have taken; it is reported as what it is
+        popen_ms = sum(ms for _, _, ms in self.spawn_latencies)
+        if self.is_running and self.total_steps > 1:
+            self._emit(
+                f"\n[{len(self.spawn_latencies)}/{self.total_steps} steps spawned in "
+                f"{launch_ms:.1f} ms with {workers} spawn workers; "
+                f"summed Popen time {popen_ms:.1f} ms]\n"
+            )
+        if self.spawn_errors:
+            self._emit(
+                f"\n⚠ {len(self.spawn_errors)} step(s) failed to launch: "
+                + ", ".join(str(n) for n in sorted(self.spawn_errors))
+                + "\n"
+            )
 
-            # Print a header for this step
-            self.on_output(f"\n{'='*80}\n")
-            self.on_output(f"Step {self.current_step}/{self.total_steps}: {label}\n")
-            self.on_output(f"{'='*80}\n\n")
-
-            cmd = step.get("command")
-            cwd = step.get("cwd") or None
-
-            try:
-                system = platform.system()
-                if system == "Windows":
-                    # CREATE_NEW_PROCESS_GROUP → child processes form a new process group
-                    p = subprocess.Popen(
-                        cmd,
-                        shell=True,
-                        cwd=cwd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
-                    )
-                else:
-                    # On Unix, preexec_fn=os.setsid → new session/process group
-                    p = subprocess.Popen(
-                        cmd,
-                        shell=True,
-                        cwd=cwd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        preexec_fn=os.setsid,
-                    )
-                self.processes.append(p)
-
-                # Start a thread to stream this process’s output
-                t = threading.Thread(target=self._stream_output, args=(p,), daemon=True)
-                t.start()
-                self.threads.append(t)
-
-                # (Optional) small delay so logs don’t interleave exactly at once
-                time.sleep(0.1)
-
-            except Exception as e:
-                self.on_output(
-                    f"\n‼ Error launching step {self.current_step} '{cmd}': {e}\n"
-                )
-                if self.is_running:
-                    self.on_output("🛑 Stopping execution due to error.\n")
-                    self.is_running = False
-                break
+        self.launching = False
+        if self.port_monitor is not None and self._awaiting_port():
+            self._port_watch = (
+                self.port_monitor.subscribe(self._on_ports_changed),
+                self.port_monitor.boost(),  # scan often while steps start up
+            )
 
         # Now that all steps are launched, wait until they all exit (or until stopped)
+        last_limit_check = last_flush = last_sweep = time.monotonic()
+        sweep_interval = PORT_SWEEP_MIN_S
         while self.is_running and any(p.poll() is None for p in self.processes):
             time.sleep(0.1)
+            now = time.monotonic()
+            if self.limits and now - last_limit_check >= 2:
+                last_limit_check = now
+                for step_num, limits in list(self.limits.values()):
+                    for msg in limits.poll():
+                        self._emit(f"\n⚠ Step {step_num} limit hit: {msg}\n", step_num)
+            if now - last_flush >= 0.5:
+                last_flush = now
+                # Report suppressed lines of steps that went quiet after a flood
+                for throttle in list(self._throttles.values()):
+                    throttle.flush()
+                if self._port_watch and not self._awaiting_port():
+                    self._stop_port_watch()
+            if self.port_monitor is None and now - last_sweep >= sweep_interval:
+                last_sweep = now
+                if self._check_port_readiness():
+                    sweep_interval = min(sweep_interval * 2, PORT_SWEEP_MAX_S)
+        self._stop_port_watch()
+
+        # Let readers drain what the exited processes printed last
+        stopped = not self.is_running
+        for t in self.threads:
+            t.join(timeout=0.5)
 
         # Print a final summary
-        if self.is_running:
-            self.on_output(f"\n{'='*80}\n")
-            self.on_output("✅ All steps completed successfully\n")
+        failed = len(self.spawn_errors)
+        self._emit(f"\n{'='*80}\n")
+        if stopped:
+            self._emit("🛑 Execution stopped\n")
+        elif failed and failed == self.total_steps:
+            self._emit("❌ No step could be launched\n")
+        elif failed:
+            self._emit(
+                f"⚠ Finished; {failed} of {self.total_steps} step(s) failed to launch\n"
+            )
         else:
-            self.on_output(f"\n{'='*80}\n")
-            self.on_output("🛑 Execution stopped\n")
-        self.on_output(f"{'='*80}\n")
+            self._emit("✅ All steps completed successfully\n")
+        self._emit(f"{'='*80}\n")
 
         # Mark finished
         self.is_running = False
+        self._report_metrics(stopped)
+        if self.capture is not None:
+            self.capture.close()
         if self.on_finish:
             self.on_finish()
 
-    def _stream_output(self, process):
+    def _emit(self, text, step=0):
+        """Send a runner message (step 0 = about the whole run) to on_output."""
+        if self.capture is not None:
+            self.capture.record(step, text)
+        self.on_output(text)
+
+    def _launch_step(self, step, step_num):
+        """Spawn pool worker: start one step and its output reader thread."""
+        if not self.is_running:
+            return
+        with self._lock:
+            self.current_step = max(self.current_step, step_num)
+        label = step.get("label") or step.get("command")
+        # One write per step so headers of concurrently spawned steps don't mix
+        header = (
+            f"\n{'='*80}\nStep {step_num}/{self.total_steps}: {label}\n{'='*80}\n\n"
+        )
+        try:
+            p, notes = self._spawn(step, step_num)
+        except Exception as e:
+            self.spawn_errors[step_num] = e
+            # Keep the step in the metrics so the run history shows the failure
+            self.step_metrics[step_num] = {
+                "step": step_num,
+                "label": label,
+                "spawn_ms": None,
+                "first_output_s": None,
+                "ready_s": None,
+                "ready_via": None,
+                "exit_code": None,
+                "duration_s": None,
+                "error": str(e) or type(e).__name__,
+            }
+            self._emit(
+                f"{header}‼ Error launching step {step_num} '{step.get('command')}': "
+                f"{e}\n",
+                step_num,
+            )
+            return
+        with self._lock:
+            if not self.is_running:
+                # stop_all ran while this step was spawning
+                self._killed_pids.add(p.pid)
+                _kill_tree(p.pid)
+                if p.pid in self.limits:
+                    self.limits.pop(p.pid)[1].finish(None)
+                return
+            self.processes.append(p)
+        self._emit(header + notes, step_num)
+
+        # Start a thread to stream this process’s output
+        t = threading.Thread(
+            target=self._stream_output,
+            args=(p, step_num),
+            name=f"fluxpilot-reader-{step_num}",
+            daemon=True,
+        )
+        t.start()
+        self.threads.append(t)
+
+    def _spawn(self, step, step_num):
+        """
+        Start one step, recording the spawn latency. Returns the Popen object and
+        the info lines to print under the step header.
+
+        Process groups are created with start_new_session / creation flags rather
+        than preexec_fn, so CPython can use its vfork/posix_spawn fast path instead
+        of the slow fork-and-run-Python-callback one. Steps with resource limits are
+        the exception: they need a small child-side setup before exec.
+        """
+        system = platform.system()
+        cwd = step.get("cwd") or None
+        mode = "exec" if step.get("mode") == "exec" else "shell"
+        if mode == "exec":
+            if step.get("argv"):
+                args = step["argv"]
+            elif system == "Windows":
+                # CreateProcess parses the command line itself; splitting it
+                # here would keep the quotes and Popen would escape them again
+                args = step.get("command")
+            else:
+                args = shlex.split(step.get("command"))
+        else:
+            args = step.get("command")
+
+        kwargs = {
+            "shell": mode == "shell",
+            "cwd": cwd,
+            "stdout": subprocess.PIPE,
+            "stderr": subprocess.STDOUT,
+            # Binary pipe: _read_output decodes it without universal newlines so
+            # carriage returns (progress bars) reach the console intact
+            "bufsize": 0,
+        }
+        if step.get("env") or self.base_env is not None:
+            base_env = os.environ if self.base_env is None else self.base_env
+            kwargs["env"] = {**base_env, **step.get("env", {})}
+        if system == "Windows":
+            # CREATE_NEW_PROCESS_GROUP → child processes form a new process group
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            # New session/process group so stop_all can kill the whole tree
+            kwargs["start_new_session"] = True
+
+        limits = None
+        if has_limits(step):
+            limits = StepLimits(step, f"{os.getpid()}-{id(self)}-{step_num}")
+            limits.prepare()
+            setup = limits.preexec()
+            if setup is not None:
+                kwargs["preexec_fn"] = setup
+
+        started = time.perf_counter()
+        try:
+            p = subprocess.Popen(args, **kwargs)
+        except Exception:
+            if limits:
+                limits.finish(None)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.spawn_latencies.append((step_num, mode, elapsed_ms))
+        self._step_procs[step_num] = (p, time.monotonic())
+        self.step_metrics[step_num] = {
+            "step": step_num,
+            "label": step.get("label") or step.get("command"),
+            "spawn_ms": elapsed_ms,
+            "first_output_s": None,
+            "ready_s": None,
+            "ready_via": None,  # "port" or "log"
+            "exit_code": None,
+            "duration_s": None,
+            "error": None,  # why the step could not be launched
+        }
+        if step.get("ready_pattern"):
+            self._ready_patterns[step_num] = re.compile(step["ready_pattern"])
+        max_lines = step.get("max_lines_per_sec", self.max_lines_per_sec)
+        if max_lines:
+            self._throttles[step_num] = _LineThrottle(int(max_lines), self.on_output)
+        notes = f"[pid {p.pid}, {mode} mode, spawned in {elapsed_ms:.1f} ms]\n"
+
+        if limits:
+            limits.after_spawn(p.pid)
+            self.limits[p.pid] = (step_num, limits)
+            notes += f"[limits: {limits.describe()}]\n"
+            for warning in limits.warnings:
+                notes += f"⚠ {warning}\n"
+        return p, notes
+
+    def pids(self):
+        """PIDs of the step processes that are still alive."""
+        return [p.pid for p in self.processes if p.poll() is None]
+
+    def active_step_count(self):
+        """Number of steps that are still starting or running."""
+        if not self.is_running:
+            return 0
+        pending = self.total_steps - len(self.processes) if self.launching else 0
+        live = sum(1 for p in self.processes if p.poll() is None)
+        return pending + live
+
+    def _mark_ready(self, step_num, via):
+        metrics = self.step_metrics[step_num]
+        if metrics["ready_s"] is None:
+            metrics["ready_s"] = time.monotonic() - self._step_procs[step_num][1]
+            metrics["ready_via"] = via
+
+    def _awaiting_port(self):
+        """(step number, Popen) of live steps still waiting to listen on a port."""
+        now = time.monotonic()
+        return [
+            (step_num, p)
+            for step_num, (p, spawned) in list(self._step_procs.items())
+            if self.step_metrics[step_num]["ready_s"] is None
+            and step_num not in self._ready_patterns
+            and now - spawned < PORT_READY_TIMEOUT_S
+            and p.poll() is None
+        ]
+
+    def _check_port_readiness(self):
+        """
+        Mark steps without a ready_pattern ready once they listen on a port.
+        Returns whether any step is still waiting.
+        """
+        waiting = self._awaiting_port()
+        if not waiting:
+            return False
+        listening = _listening_pids()
+        for step_num, p in waiting:
+            if listening is None:
+                ready = _listening_port(p.pid) is not None
+            else:
+                ready = not listening.isdisjoint(_tree_pids(p.pid))
+            if ready:
+                self._mark_ready(step_num, "port")
+        return True
+
+    def _on_ports_changed(self, event):
+        """PortMonitor thread: mark steps ready whose process tree started listening."""
+        opened = {e.get("pid") for e in event["opened"]}
+        if not opened:
+            return
+        for step_num, p in self._awaiting_port():
+            if not opened.isdisjoint(str(pid) for pid in _tree_pids(p.pid)):
+                self._mark_ready(step_num, "port")
+
+    def _stop_port_watch(self):
+        watch, self._port_watch = self._port_watch, None
+        if watch:
+            unsubscribe, release = watch
+            unsubscribe()
+            release()
+
+    def _report_metrics(self, stopped):
+        """Fill in exit codes/durations of steps still open and hand metrics out."""
+        now = time.monotonic()
+        for step_num, (p, spawned) in self._step_procs.items():
+            metrics = self.step_metrics[step_num]
+            if metrics["duration_s"] is None:
+                metrics["duration_s"] = now - spawned
+                # A step killed by stop_all did not fail; its SIGTERM exit code
+                # would only count against it in the history
+                if p.pid not in self._killed_pids:
+                    metrics["exit_code"] = p.poll()
+        if self.on_metrics and self.step_metrics:
+            try:
+                self.on_metrics(
+                    self.started_at,
+                    stopped,
+                    [self.step_metrics[n] for n in sorted(self.step_metrics)],
+                )
+            except Exception as e:
+                self._emit(f"‼ Could not record run metrics: {e}\n")
+
+    def _stream_output(self, process, step_num):
         """
         Continuously read from process.stdout and forward to on_output.
         This runs in its own thread for each process.
+
+        The pipe is always read to EOF at full speed, even after stop_all or while
+        the step is over its lines/sec ceiling, so a child never blocks writing to
+        a full pipe; only forwarding is limited.
         """
-        for line in process.stdout:
+        metrics = self.step_metrics[step_num]
+        spawned = self._step_procs[step_num][1]
+        ready_re = self._ready_patterns.get(step_num)
+        throttle = self._throttles.get(step_num)
+        emit = throttle.line if throttle else self.on_output
+        capture = self.capture
+        for line in _read_output(process.stdout):
             if not self.is_running:
-                break
-            # You could prefix each line with step index if desired; for now, just emit as-is
-            self.on_output(line)
+                # Stopped: discard, but keep draining until the child is gone
+                continue
+            if capture is not None:
+                # Captured before throttling, so replays see the full output
+                capture.record(step_num, line)
+            if metrics["first_output_s"] is None:
+                metrics["first_output_s"] = time.monotonic() - spawned
+            if ready_re and metrics["ready_s"] is None and ready_re.search(line):
+                self._mark_ready(step_num, "log")
+            emit(line)
+        if throttle:
+            throttle.flush(final=True)
+
+        stopped = not self.is_running
+        if not stopped:
+            metrics["exit_code"] = process.wait()
+            metrics["duration_s"] = time.monotonic() - spawned
+
+        # Report OOM kills, throttling or rlimit hits for limited steps
+        if process.pid in self.limits:
+            step_num, limits = self.limits.pop(process.pid)
+            returncode = process.poll() if stopped else process.wait()
+            for msg in limits.finish(returncode):
+                self._emit(f"\n⚠ Step {step_num} limit hit: {msg}\n", step_num)
 
     def stop_all(self):
         """Terminate all running processes (including child processes)."""
         if not self.is_running:
             return
-        self.is_running = False
-        system = platform.system()
-        for p in self.processes:
-            try:
-                pid = p.pid
-                if pid is None:
-                    continue
-                if system == "Windows":
-                    # /T kills entire tree, /F forces termination
-                    subprocess.run(
-                        ["taskkill", "/PID", str(pid), "/T", "/F"],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-                else:
-                    # Kill the entire process group
-                    os.killpg(os.getpgid(pid), signal.SIGTERM)
-            except Exception:
-                pass
-        self.processes.clear()
+        with self._lock:
+            self.is_running = False
+            for p in self.processes:
+                if p.poll() is None:
+                    self._killed_pids.add(p.pid)
+                _kill_tree(p.pid)
+            self.processes.clear()
+
+
+def _kill_tree(pid):
+    """Terminate a step process together with its children."""
+    try:
+        if pid is None:
+            return
+        if platform.system() == "Windows":
+            # /T kills entire tree, /F forces termination
+            subprocess.run(
+                ["taskkill", "/PID", str(pid), "/T", "/F"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            # Kill the entire process group
+            os.killpg(os.getpgid(pid), signal.SIGTERM)
+    except Exception:
+        pass
+
+
+class _LineThrottle:
+    """
+    Lines/sec ceiling for one step's output. Lines within the budget of the
+    current one-second window are forwarded; the rest are only counted and
+    reported as one "… N lines suppressed" line when the window rolls over.
+    """
+
+    def __init__(self, max_per_sec, emit):
+        self.max_per_sec = max_per_sec
+        self.emit = emit
+        self.window_start = time.monotonic()
+        self.count = 0  # lines forwarded in the current window
+        self.suppressed = 0  # lines dropped since the last summary
+        self.lock = threading.Lock()  # flush() runs on the runner thread
+
+    def line(self, text):
+        with self.lock:
+            self._roll(time.monotonic())
+            if self.count < self.max_per_sec:
+                self.count += 1
+                self.emit(text)
+            else:
+                self.suppressed += 1
+
+    def flush(self, final=False):
+        """Emit the pending summary if the window is over (or final is set)."""
+        with self.lock:
+            self._roll(time.monotonic())
+            if final:
+                self._summarize()
+
+    def _roll(self, now):
+        if now - self.window_start >= 1.0:
+            self._summarize()
+            self.window_start = now
+            self.count = 0
+
+    def _summarize(self):
+        if self.suppressed:
+            self.emit(
+                f"\n… {self.suppressed:,} lines suppressed "
+                f"(over {self.max_per_sec:,} lines/s)\n"
+            )
+            self.suppressed = 0
+
+
+def _tree_pids(pid):
+    """pid and the PIDs of all its descendants."""
+    try:
+        return {pid} | {c.pid for c in psutil.Process(pid).children(recursive=True)}
+    except psutil.Error:
+        return {pid}
+
+
+def _listening_pids():
+    """
+    PIDs with a listening inet socket, from one system-wide scan, or None where
+    that needs privileges (macOS) and processes have to be asked one by one.
+    """
+    try:
+        return {
+            c.pid
+            for c in psutil.net_connections(kind="inet")
+            if c.status == psutil.CONN_LISTEN and c.pid
+        }
+    except psutil.AccessDenied:
+        return None
+
+
+def _listening_port(pid):
+    """Return a port the process (or one of its children) listens on, or None."""
+    try:
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return None
+    for pr in procs:
+        try:
+            # psutil >= 6 renamed connections() to net_connections()
+            get_conns = getattr(pr, "net_connections", None) or pr.connections
+            for conn in get_conns(kind="inet"):
+                if conn.status == psutil.CONN_LISTEN and conn.laddr:
+                    return conn.laddr.port
+        except psutil.Error:
+            continue
+    return None
+
+
+def _read_output(stream):
+    """
+    Yield decoded output from a binary pipe as soon as it arrives: complete lines
+    (ending in "\n") and, for progress-bar style output, partial lines that contain
+    a carriage return.
+    """
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(
+        errors="replace"
+    )
+    pending = ""
+    while True:
+        chunk = stream.read(65536)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        end = pending.rfind("\n") + 1
+        if end:
+            yield from pending[:end].splitlines(keepends=True)
+            pending = pending[end:]
+        if "\r" in pending:
+            yield pending
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
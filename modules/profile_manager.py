@@ -22,6 +22,43 @@ def get_config_dir():
 
 
 CONFIG_FILE = get_config_dir() / "profiles.json"
+SETTINGS_FILE = get_config_dir() / "settings.json"
+
+# Defaults for launcher-wide settings; anything in settings.json overrides these.
+DEFAULT_SETTINGS = {
+    # Maximum number of steps that may be starting or running at once across
+    # all runs. Runs that would exceed it wait in the launch queue. It is checked
+    # per run: a single run with more steps than this still starts, by itself.
+    "max_concurrent_steps": 16,
+    # Optional load-average headroom: only start a queued run while the 1-minute
+    # load average per CPU is below this value (None disables the check).
+    "max_load_per_cpu": None,
+    # Optional system-wide CPU utilisation ceiling (percent) for starting runs.
+    "max_cpu_percent": None,
+    # Run profiles in the background daemon (Unix only) so they survive GUI
+    # restarts and other clients can attach to them.
+    "use_daemon": True,
+    # Output kept per run by the daemon for replay when a client attaches.
+    "daemon_scrollback_kb": 4096,
+    # The daemon exits after this long with no runs and no clients (0 = never).
+    "daemon_idle_timeout_s": 600,
+    # Record per-step startup metrics of every run in the local history store.
+    "record_history": True,
+    # How many steps of a run are spawned concurrently.
+    "spawn_workers": 8,
+    # Per-step output ceiling; lines beyond it are summarized (0 = unlimited).
+    # A step's own "max_lines_per_sec" key overrides it.
+    "max_lines_per_sec": 2000,
+    # Record every run's output with timestamps and step numbers to a capture
+    # file under the config dir, for replay with "Replay...".
+    "capture_runs": False,
+    # Sampling interval of the built-in profiler (Profile UI button).
+    "profiler_interval_ms": 50,
+    # Shared port monitor: scan interval while the ports popup is open or steps
+    # wait to listen on a port / otherwise.
+    "port_scan_fast_s": 1.0,
+    "port_scan_idle_s": 10.0,
+}
 
 
 def load_profiles():
@@ -45,10 +82,27 @@ def save_profiles(profiles):
         json.dump({"profiles": profiles}, f, indent=2)
 
 
+def load_settings():
+    """
+    Load launcher settings from SETTINGS_FILE (JSON), merged over DEFAULT_SETTINGS.
+    A missing or unreadable file yields the defaults.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.isfile(SETTINGS_FILE):
+        try:
+            with open(SETTINGS_FILE, "r") as f:
+                settings.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return settings
+
+
 class ProfileDialog(ctk.CTkToplevel):
     """
     Dialog for adding/editing a profile. Each profile has a name and a list of steps.
-    Step: { 'label': str, 'command': str, 'cwd': str or None }
+    Step: { 'label': str, 'command': str, 'cwd': str or None, 'mode': 'shell'|'exec' }
+    Keys the dialog does not edit (e.g. 'argv', 'ports', 'env', or profile-level
+    'vars' and 'extends', see modules.profile_templates) are kept as they were.
     """
 
     def __init__(self, master, profile=None, on_save=None):
@@ -93,12 +147,21 @@ class ProfileDialog(ctk.CTkToplevel):
             self.rows_frame, text="Working Dir", font=ctk.CTkFont(weight="bold")
         ).grid(row=0, column=2, padx=5, pady=5, sticky="w")
 
-        self.step_vars = []  # list of (labelVar, commandVar, cwdVar, [widgets])
+        ctk.CTkLabel(
+            self.rows_frame, text="Exec", font=ctk.CTkFont(weight="bold")
+        ).grid(row=0, column=4, padx=5, pady=5, sticky="w")
+
+        # list of (labelVar, commandVar, cwdVar, execVar, original step, [widgets])
+        self.step_vars = []
 
         # Populate existing steps
         for step in self.original.get("steps", []):
             self._add_step_row(
-                step.get("label", ""), step.get("command", ""), step.get("cwd", "")
+                step.get("label", ""),
+                step.get("command", ""),
+                step.get("cwd", ""),
+                step.get("mode") == "exec",
+                step,
             )
         if not self.step_vars:
             self._add_step_row()
@@ -134,12 +197,15 @@ class ProfileDialog(ctk.CTkToplevel):
 
         self.protocol("WM_DELETE_WINDOW", self.destroy)
 
-    def _add_step_row(self, label_text="", cmd_text="", cwd_text=""):
-        """Add a row of entries for label, command, and cwd."""
+    def _add_step_row(
+        self, label_text="", cmd_text="", cwd_text="", exec_mode=False, step=None
+    ):
+        """Add a row of entries for label, command, cwd, and exec mode."""
         row = len(self.step_vars) + 1
         lbl_var = ctk.StringVar(value=label_text)
         cmd_var = ctk.StringVar(value=cmd_text)
-        cwd_var = ctk.StringVar(value=cwd_text)
+        cwd_var = ctk.StringVar(value=cwd_text or "")
+        exec_var = ctk.BooleanVar(value=exec_mode)
 
         e1 = ctk.CTkEntry(self.rows_frame, textvariable=lbl_var, width=150)
         e1.grid(row=row, column=0, padx=5, pady=5, sticky="ew")
@@ -158,15 +224,28 @@ class ProfileDialog(ctk.CTkToplevel):
         )
         browse_btn.grid(row=row, column=3, padx=5, pady=5)
 
+        # Exec mode: run the command without a shell (faster spawn, no extra process)
+        exec_check = ctk.CTkCheckBox(
+            self.rows_frame, text="", width=24, variable=exec_var
+        )
+        exec_check.grid(row=row, column=4, padx=5, pady=5)
+
         self.step_vars.append(
-            (lbl_var, cmd_var, cwd_var, [e1, e2, cwd_entry, browse_btn])
+            (
+                lbl_var,
+                cmd_var,
+                cwd_var,
+                exec_var,
+                step or {},
+                [e1, e2, cwd_entry, browse_btn, exec_check],
+            )
         )
 
     def _remove_last_step(self):
         """Remove the last added step row."""
         if not self.step_vars:
             return
-        lbl_var, cmd_var, cwd_var, widgets = self.step_vars.pop()
+        widgets = self.step_vars.pop()[-1]
         for w in widgets:
             w.destroy()
 
@@ -183,22 +262,33 @@ class ProfileDialog(ctk.CTkToplevel):
             return
 
         steps = []
-        for lbl_var, cmd_var, cwd_var, _ in self.step_vars:
+        for lbl_var, cmd_var, cwd_var, exec_var, original, _ in self.step_vars:
             cmd = cmd_var.get().strip()
             if not cmd:
                 continue
-            step = {
-                "label": lbl_var.get().strip(),
-                "command": cmd,
-                "cwd": cwd_var.get().strip() or None,
-            }
+            step = dict(original)
+            step.update(
+                {
+                    "label": lbl_var.get().strip(),
+                    "command": cmd,
+                    "cwd": cwd_var.get().strip() or None,
+                }
+            )
+            if exec_var.get():
+                step["mode"] = "exec"
+            else:
+                step.pop("mode", None)
+            # An explicit argv only applies while the command it came from is unchanged
+            if "argv" in step and cmd != original.get("command"):
+                del step["argv"]
             steps.append(step)
 
-        if not steps:
+        if not steps and not self.original.get("extends"):
             messagebox.showerror("Error", "You must specify at least one command.")
             return
 
-        new_profile = {"name": name, "steps": steps}
+        new_profile = dict(self.original)
+        new_profile.update({"name": name, "steps": steps})
         if self.on_save:
             self.on_save(new_profile)
         self.destroy()
@@ -0,0 +1,254 @@
+import os
+import re
+
+# ${name} is replaced by a profile variable; $${name} escapes it to a literal
+# ${name}. Names that are not defined are left alone for the shell to expand.
+_VAR_RE = re.compile(r"\$(\$?)\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_ENV_LINE_RE = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=\s*(.*)$")
+# Values in matching quotes, by opening quote; \" escapes need double quotes
+_QUOTED_RES = {"'": re.compile(r"'([^']*)'"), '"': re.compile(r'"((?:[^"\\]|\\.)*)"')}
+_MAX_VAR_PASSES = 5  # how deep variables may refer to other variables
+
+_env_file_cache = {}  # absolute path -> ((mtime_ns, size), values)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def parse_env(text):
+    """Parse .env text: KEY=VALUE lines, optional 'export', quotes and comments."""
+    values = {}
+    for line in text.splitlines():
+        match = _ENV_LINE_RE.match(line)
+        if not match or line.lstrip().startswith("#"):
+            continue
+        key, value = match.group(1), match.group(2).strip()
+        pattern = _QUOTED_RES.get(value[:1])
+        quoted = pattern.match(value) if pattern else None
+        if quoted:
+            # Everything after the closing quote (e.g. a comment) is dropped
+            quote, value = value[0], quoted.group(1)
+            if quote == '"':
+                value = value.replace("\\n", "\n").replace('\\"', '"')
+        else:
+            value = re.split(r"\s+#", value, maxsplit=1)[0].strip()
+        values[key] = value
+    return values
+
+
+def load_env_file(path):
+    """
+    Values of a .env file, parsed once and cached until the file's mtime or size
+    changes. A missing file raises ValueError.
+    """
+    path = os.path.abspath(path)
+    stamp = _file_stamp(path)
+    if stamp is None:
+        raise ValueError(f"env file not found: {path}")
+    cached = _env_file_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        values = parse_env(f.read())
+    _env_file_cache[path] = (stamp, values)
+    return values
+
+
+def substitute(value, variables):
+    """Replace ${name} in strings inside value (recursing into lists and dicts)."""
+    if isinstance(value, str):
+
+        def repl(match):
+            if match.group(1):
+                return "${" + match.group(2) + "}"
+            return variables.get(match.group(2), match.group(0))
+
+        return _VAR_RE.sub(repl, value)
+    if isinstance(value, list):
+        return [substitute(v, variables) for v in value]
+    if isinstance(value, dict):
+        return {k: substitute(v, variables) for k, v in value.items()}
+    return value
+
+
+def _resolve_vars(raw):
+    """Let variables refer to each other, a few levels deep."""
+    variables = {k: str(v) for k, v in raw.items()}
+    for _ in range(_MAX_VAR_PASSES):
+        resolved = {k: substitute(v, variables) for k, v in variables.items()}
+        if resolved == variables:
+            break
+        variables = resolved
+    return variables
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def merge_extends(profile, by_name, _seen=()):
+    """
+    Return profile merged over the chain of profiles it "extends". Plain keys
+    override the base; "vars" and "env" are merged key by key; a profile without
+    steps inherits the base's steps.
+    """
+    base_name = profile.get("extends")
+    if not base_name:
+        return dict(profile)
+    if base_name in _seen or base_name == profile["name"]:
+        raise ValueError(
+            f"profile '{profile['name']}' extends itself via '{base_name}'"
+        )
+    base = by_name.get(base_name)
+    if base is None:
+        raise ValueError(
+            f"profile '{profile['name']}' extends unknown profile '{base_name}'"
+        )
+    merged = merge_extends(base, by_name, _seen + (profile["name"],))
+    result = dict(merged)
+    result.update(profile)
+    for key in ("vars", "env"):
+        result[key] = {**merged.get(key, {}), **profile.get(key, {})}
+    if not profile.get("steps"):
+        result["steps"] = merged.get("steps", [])
+    # Being a template or having instances is a property of the profile itself
+    result["template"] = profile.get("template", False)
+    result["instances"] = profile.get("instances")
+    del result["extends"]
+    return result
+
+
+class ProfileResolver:
+    """
+    Turns stored profiles into concrete, launch-ready ones.
+
+    Profile keys (all optional):
+      vars      {name: value} substituted as ${name} in every step string
+      env       {NAME: value} environment for every step (values may use ${vars})
+      env_file  path or list of .env files; their values become env entries and
+                variables. Relative paths are taken from the profile "cwd".
+      cwd       default working directory of steps without their own
+      extends   name of a base profile to inherit from
+      instances [{"name": ..., "vars": {...}}, ...] launches one concrete profile
+                per instance, named "profile [instance]", with ${instance} set
+      template  true for base profiles that are not launched by themselves
+    Steps may carry their own env / env_file (relative to the step cwd).
+
+    Results are cached per profile name; the cache entry stays valid until
+    invalidate() is called (the launcher does so whenever profiles are edited)
+    or one of the .env files it read changes on disk, so launching does no
+    parsing or substitution work again.
+    """
+
+    def __init__(self):
+        self._cache = {}  # profile name -> ([(env path, stamp)], concrete profiles)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def resolve(self, profile, profiles):
+        """
+        Concrete profiles to launch for a stored profile: a list with one entry,
+        or one per instance. Raises ValueError for a broken definition.
+        """
+        cached = self._cache.get(profile["name"])
+        if cached is not None:
+            env_files, concrete = cached
+            if all(_file_stamp(path) == stamp for path, stamp in env_files):
+                return concrete
+        env_files = []
+        merged = merge_extends(profile, {p["name"]: p for p in profiles})
+        instances = merged.get("instances")
+        if instances:
+            concrete = []
+            for instance in instances:
+                if isinstance(instance, str):
+                    instance = {"name": instance}
+                variables = {
+                    **merged.get("vars", {}),
+                    "instance": instance["name"],
+                    **instance.get("vars", {}),
+                }
+                concrete.append(
+                    self._concrete(
+                        merged,
+                        f"{profile['name']} [{instance['name']}]",
+                        variables,
+                        env_files,
+                    )
+                )
+        else:
+            concrete = [
+                self._concrete(
+                    merged, profile["name"], merged.get("vars", {}), env_files
+                )
+            ]
+        self._cache[profile["name"]] = (
+            [(path, _file_stamp(path)) for path in env_files],
+            concrete,
+        )
+        return concrete
+
+    def _concrete(self, merged, name, raw_vars, env_files):
+        variables = _resolve_vars(raw_vars)
+        profile_cwd = substitute(merged.get("cwd"), variables)
+        file_env = self._load_env_files(
+            merged.get("env_file"), profile_cwd, variables, env_files
+        )
+        # .env values are usable as variables too; explicit vars win. The values
+        # themselves may use ${vars} as well.
+        variables = _resolve_vars({**file_env, **raw_vars})
+        profile_env = {
+            **substitute(file_env, variables),
+            **{
+                k: str(v)
+                for k, v in substitute(merged.get("env", {}), variables).items()
+            },
+        }
+
+        steps = []
+        for step in merged.get("steps", []):
+            resolved = substitute(
+                {k: v for k, v in step.items() if k not in ("env", "env_file")},
+                variables,
+            )
+            if not resolved.get("cwd") and profile_cwd:
+                resolved["cwd"] = profile_cwd
+            if resolved.get("cwd"):
+                resolved["cwd"] = os.path.expanduser(resolved["cwd"])
+            if "ports" in resolved:
+                resolved["ports"] = [
+                    int(p) if str(p).isdigit() else p for p in resolved["ports"]
+                ]
+            env = dict(profile_env)
+            step_file_env = self._load_env_files(
+                step.get("env_file"), resolved.get("cwd"), variables, env_files
+            )
+            env.update(substitute(step_file_env, variables))
+            env.update(
+                {
+                    k: str(v)
+                    for k, v in substitute(step.get("env", {}), variables).items()
+                }
+            )
+            if env:
+                resolved["env"] = env
+            steps.append(resolved)
+        return {"name": name, "steps": steps, "source": merged["name"]}
+
+    def _load_env_files(self, paths, cwd, variables, env_files):
+        values = {}
+        for path in _as_list(paths):
+            path = os.path.expanduser(substitute(path, variables))
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.expanduser(cwd or os.getcwd()), path)
+            env_files.append(os.path.abspath(path))
+            values.update(load_env_file(path))
+        return values
@@ -0,0 +1,350 @@
+import os
+import platform
+import signal
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# The daemon is started in a systemd scope named "<SCOPE_PREFIX>-<n>.scope" with
+# Delegate=yes; only such a scope is FluxPilot's to subdivide. The daemon moves
+# itself into the LAUNCHER_CGROUP leaf of it, and step cgroups become siblings.
+SCOPE_PREFIX = "fluxpilot-daemon"
+LAUNCHER_CGROUP = "fluxpilot-launcher"
+STEP_CONTROLLERS = ("memory", "cpu")
+
+# Step keys understood by StepLimits
+LIMIT_KEYS = (
+    "nice",  # int, added to the launcher's niceness
+    "ionice",  # int 0-7, best-effort I/O priority level (Linux)
+    "cpu_affinity",  # list of CPU indexes the step may run on
+    "memory_limit_mb",  # int, cgroup memory.max or RLIMIT_DATA fallback (Linux)
+    "cpu_limit_percent",  # int, share of one CPU via cgroup cpu.max
+    "cpu_time_limit_s",  # int, RLIMIT_CPU (total CPU seconds)
+)
+
+
+def has_limits(step):
+    """True if the step declares any resource limit."""
+    return any(step.get(key) is not None for key in LIMIT_KEYS)
+
+
+def _own_cgroup_dir():
+    """Return the launcher's cgroup v2 directory, or None without a v2 hierarchy."""
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    path = os.path.join(CGROUP_ROOT, line[3:].strip().lstrip("/"))
+                    if os.path.isfile(os.path.join(path, "cgroup.controllers")):
+                        return path
+    except OSError:
+        pass
+    return None
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def claim_cgroup():
+    """
+    Called by the daemon at startup: if it runs in its own delegated scope, move
+    it into the LAUNCHER_CGROUP leaf and enable STEP_CONTROLLERS for the scope's
+    children (cgroup v2 only hands controllers to children of a cgroup without
+    processes of its own). Everything is undone if that fails. Returns an error
+    message, or None once step cgroups can be created.
+    """
+    scope = _own_cgroup_dir()
+    if scope is None:
+        return "no cgroup v2 hierarchy"
+    name = os.path.basename(scope)
+    if name == LAUNCHER_CGROUP:
+        return None  # already claimed
+    if not (name.startswith(SCOPE_PREFIX + "-") and name.endswith(".scope")):
+        return "not running in a delegated FluxPilot scope"
+    leaf = os.path.join(scope, LAUNCHER_CGROUP)
+    try:
+        with open(os.path.join(scope, "cgroup.controllers")) as f:
+            available = f.read().split()
+        controllers = [c for c in STEP_CONTROLLERS if c in available]
+        if not controllers:
+            return "no memory or cpu controller delegated"
+        os.makedirs(leaf, exist_ok=True)
+        _write(os.path.join(leaf, "cgroup.procs"), str(os.getpid()))
+    except OSError as e:
+        return f"cannot create {leaf}: {e.strerror or e}"
+    try:
+        _write(
+            os.path.join(scope, "cgroup.subtree_control"),
+            " ".join("+" + c for c in controllers),
+        )
+    except OSError as e:
+        try:
+            _write(os.path.join(scope, "cgroup.procs"), str(os.getpid()))
+            os.rmdir(leaf)
+        except OSError:
+            pass
+        return f"cannot enable cgroup controllers: {e.strerror or e}"
+    return None
+
+
+def _step_cgroup_parent(controllers):
+    """
+    Return the cgroup v2 directory that step cgroups are created in, or raise
+    OSError. That is only the case in a scope claimed by claim_cgroup(), with the
+    given controllers enabled; cgroups owned by anything else (a terminal's or
+    the desktop session's scope) are left alone.
+    """
+    own = _own_cgroup_dir()
+    if own is None or os.path.basename(own) != LAUNCHER_CGROUP:
+        raise OSError("steps run outside the FluxPilot daemon's delegated scope")
+    parent = os.path.dirname(own)
+    with open(os.path.join(parent, "cgroup.subtree_control")) as f:
+        enabled = f.read().split()
+    missing = [c for c in controllers if c not in enabled]
+    if missing:
+        raise OSError(f"cgroup controller(s) not delegated: {' '.join(missing)}")
+    return parent
+
+
+def _read_keyed(path):
+    """Parse a cgroup 'key value' file such as memory.events or cpu.stat."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit():
+                    values[parts[0]] = int(parts[1])
+    except OSError:
+        pass
+    return values
+
+
+class StepLimits:
+    """
+    Resource limits for one step, applied when the step is spawned.
+
+    Memory and CPU bandwidth limits go into a per-step cgroup v2, which needs the
+    daemon running in its own delegated systemd scope (see claim_cgroup). Without
+    one (in-process runs, no systemd user manager), memory falls back to
+    RLIMIT_DATA on Linux and CPU bandwidth is not limited. RLIMIT_DATA rather than
+    RLIMIT_AS: runtimes such as V8 or the JVM reserve large PROT_NONE regions up
+    front and cannot start under an address-space limit, while RLIMIT_DATA only
+    counts memory they can actually write. Nice level, rlimits, affinity and
+    the cgroup move happen in the child before exec; ionice is applied right after
+    spawn through psutil.
+    """
+
+    def __init__(self, step, name):
+        """
+        step: the step dict (see LIMIT_KEYS)
+        name: unique name for the step's cgroup, e.g. "<pid>-<run>-<step>"
+        """
+        self.name = name
+        self.nice = step.get("nice")
+        self.ionice = step.get("ionice")
+        self.cpu_affinity = step.get("cpu_affinity")
+        self.memory_limit_mb = step.get("memory_limit_mb")
+        self.cpu_limit_percent = step.get("cpu_limit_percent")
+        self.cpu_time_limit_s = step.get("cpu_time_limit_s")
+        self.cgroup = None  # path of the per-step cgroup, once created
+        self.memory_rlimit = False  # memory limited through RLIMIT_DATA instead
+        self.warnings = []  # limits that could not be applied
+        self._seen = {}  # last cgroup event counters reported by poll()
+
+    def prepare(self):
+        """Parent side, before spawn: create the per-step cgroup if one is needed."""
+        if self.memory_limit_mb is None and self.cpu_limit_percent is None:
+            return
+        system = platform.system()
+        if system != "Linux":
+            if self.cpu_limit_percent is not None:
+                self.warnings.append("CPU bandwidth limit needs Linux cgroups")
+            if self.memory_limit_mb is not None and system != "Windows":
+                # Windows reports this after spawn
+                self.warnings.append("memory limit needs Linux, ignored")
+            return
+        try:
+            self._create_cgroup()
+            return
+        except OSError as e:
+            self._remove_cgroup()
+            reason = e.strerror or str(e)
+        if self.cpu_limit_percent is not None:
+            self.warnings.append(f"no usable cgroup v2 ({reason}), CPU limit ignored")
+        if self.memory_limit_mb is not None:
+            self.memory_rlimit = hasattr(resource, "RLIMIT_DATA")
+            if not self.memory_rlimit:
+                self.warnings.append(
+                    f"no usable cgroup v2 ({reason}), memory limit ignored"
+                )
+
+    def _create_cgroup(self):
+        wanted = []
+        if self.memory_limit_mb is not None:
+            wanted.append("memory")
+        if self.cpu_limit_percent is not None:
+            wanted.append("cpu")
+        parent = _step_cgroup_parent(wanted)
+        self.cgroup = os.path.join(parent, f"fluxpilot-{self.name}")
+        os.mkdir(self.cgroup)
+        if self.memory_limit_mb is not None:
+            with open(os.path.join(self.cgroup, "memory.max"), "w") as f:
+                f.write(str(int(self.memory_limit_mb) * 1024 * 1024))
+        if self.cpu_limit_percent is not None:
+            period = 100000
+            quota = max(1000, int(period * self.cpu_limit_percent / 100))
+            with open(os.path.join(self.cgroup, "cpu.max"), "w") as f:
+                f.write(f"{quota} {period}")
+
+    def _remove_cgroup(self):
+        if self.cgroup:
+            try:
+                os.rmdir(self.cgroup)
+            except OSError:
+                pass
+        self.cgroup = None
+
+    def preexec(self):
+        """
+        Return the child-side setup callable, or None if nothing has to run in the
+        child. Only steps with limits pay for preexec_fn's slower spawn path.
+        """
+        if platform.system() == "Windows":
+            return None
+        nice = self.nice
+        affinity = self.cpu_affinity
+        cgroup_procs = (
+            os.path.join(self.cgroup, "cgroup.procs") if self.cgroup else None
+        )
+        rlimits = []
+        if self.memory_rlimit:
+            limit = int(self.memory_limit_mb) * 1024 * 1024
+            rlimits.append((resource.RLIMIT_DATA, (limit, limit)))
+        if self.cpu_time_limit_s is not None:
+            soft = int(self.cpu_time_limit_s)
+            # SIGXCPU at the soft limit, SIGKILL a few seconds later
+            rlimits.append((resource.RLIMIT_CPU, (soft, soft + 5)))
+        use_affinity = affinity is not None and hasattr(os, "sched_setaffinity")
+        if nice is None and not use_affinity and not cgroup_procs and not rlimits:
+            return None
+
+        def setup():
+            # Runs in the forked child: keep it to plain system calls
+            if cgroup_procs:
+                with open(cgroup_procs, "w") as f:
+                    f.write("0")
+            for which, limits in rlimits:
+                resource.setrlimit(which, limits)
+            if nice is not None:
+                os.nice(int(nice))
+            if use_affinity:
+                os.sched_setaffinity(0, affinity)
+
+        return setup
+
+    def after_spawn(self, pid):
+        """Parent side, right after spawn: apply what cannot be done pre-exec."""
+        try:
+            proc = psutil.Process(pid)
+            if self.ionice is not None and hasattr(psutil, "IOPRIO_CLASS_BE"):
+                proc.ionice(psutil.IOPRIO_CLASS_BE, value=int(self.ionice))
+            if platform.system() == "Windows":
+                if self.nice is not None and int(self.nice) > 0:
+                    proc.nice(
+                        psutil.IDLE_PRIORITY_CLASS
+                        if int(self.nice) >= 10
+                        else psutil.BELOW_NORMAL_PRIORITY_CLASS
+                    )
+                if self.cpu_affinity is not None:
+                    proc.cpu_affinity(list(self.cpu_affinity))
+                if self.memory_limit_mb is not None:
+                    self.warnings.append("memory limit is not supported on Windows")
+            elif self.cpu_affinity is not None and not hasattr(os, "sched_setaffinity"):
+                self.warnings.append("CPU affinity is not supported on this platform")
+        except (psutil.Error, OSError, ValueError) as e:
+            self.warnings.append(f"could not apply limits after spawn: {e}")
+
+    def describe(self):
+        """Short human-readable summary of the limits in effect."""
+        parts = []
+        if self.nice is not None:
+            parts.append(f"nice {self.nice}")
+        if self.ionice is not None:
+            parts.append(f"ionice {self.ionice}")
+        if self.cpu_affinity is not None:
+            parts.append("cpus " + ",".join(str(c) for c in self.cpu_affinity))
+        if self.memory_limit_mb is not None and (self.cgroup or self.memory_rlimit):
+            how = "cgroup" if self.cgroup else "rlimit"
+            parts.append(f"memory {self.memory_limit_mb} MB ({how})")
+        if self.cpu_limit_percent is not None and self.cgroup:
+            parts.append(f"cpu {self.cpu_limit_percent}%")
+        if self.cpu_time_limit_s is not None:
+            parts.append(f"cpu time {self.cpu_time_limit_s}s")
+        return ", ".join(parts)
+
+    def poll(self):
+        """Return messages for limit events (OOM kills, throttling) since last poll."""
+        if not self.cgroup:
+            return []
+        messages = []
+        events = _read_keyed(os.path.join(self.cgroup, "memory.events"))
+        stats = _read_keyed(os.path.join(self.cgroup, "cpu.stat"))
+        oom_kills = events.get("oom_kill", 0) - self._seen.get("oom_kill", 0)
+        if oom_kills > 0:
+            messages.append(
+                f"OOM kill: memory limit of {self.memory_limit_mb} MB reached "
+                f"({oom_kills} process(es) killed)"
+            )
+        throttled = stats.get("nr_throttled", 0) - self._seen.get("nr_throttled", 0)
+        if throttled > 0 and self.cpu_limit_percent is not None:
+            messages.append(
+                f"CPU throttled {throttled} time(s) at the "
+                f"{self.cpu_limit_percent}% limit"
+            )
+        self._seen["oom_kill"] = events.get("oom_kill", 0)
+        self._seen["nr_throttled"] = stats.get("nr_throttled", 0)
+        return messages
+
+    def finish(self, returncode):
+        """Report limit hits once the step has exited, then clean up its cgroup."""
+        messages = self.poll()
+        sig = None
+        sigkill = getattr(signal, "SIGKILL", None)  # not defined on Windows
+        if platform.system() == "Windows":
+            # Exit codes there are not signal numbers; nothing to decode
+            pass
+        elif returncode is not None and returncode < 0:
+            sig = -returncode
+        elif returncode is not None and returncode > 128:
+            # A shell reports a child killed by signal N as exit status 128 + N
+            sig = returncode - 128
+        if sig is not None and (
+            sig == getattr(signal, "SIGXCPU", None)
+            or (self.cpu_time_limit_s is not None and sig == sigkill)
+        ):
+            messages.append(
+                f"CPU time limit of {self.cpu_time_limit_s}s reached "
+                f"(killed by signal {sig})"
+            )
+        elif (
+            sig is not None and sig == sigkill and self.memory_limit_mb and not messages
+        ):
+            messages.append(
+                f"killed by SIGKILL, possibly the {self.memory_limit_mb} MB "
+                "memory limit"
+            )
+        elif returncode and self.memory_rlimit:
+            messages.append(
+                f"exited with code {returncode}; allocations beyond the "
+                f"{self.memory_limit_mb} MB data limit fail"
+            )
+        self._remove_cgroup()
+        return messages
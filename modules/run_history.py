@@ -0,0 +1,338 @@
+import math
+import sqlite3
+import statistics
+import time
+import customtkinter as ctk
+from tkinter import ttk
+
+from modules.profile_manager import get_config_dir
+
+HISTORY_FILE = get_config_dir() / "history.sqlite3"
+MAX_RUNS_PER_PROFILE = 500  # older runs are pruned on insert
+
+# A step regresses when its recent median is this much slower than the baseline
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_SECONDS = 0.2
+RECENT_RUNS = 5
+BASELINE_RUNS = 20
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    stopped INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile, started_at);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    label TEXT,
+    spawn_ms REAL,
+    first_output_s REAL,
+    ready_s REAL,
+    ready_via TEXT,
+    exit_code INTEGER,
+    duration_s REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS steps_run ON steps (run_id);
+"""
+
+
+class HistoryStore:
+    """
+    Local run history in a small SQLite database under the config dir.
+    Each call opens its own connection, so it is safe to use from any thread.
+    """
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = str(path)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            # Databases created before launch errors were recorded
+            columns = {row[1] for row in db.execute("PRAGMA table_info(steps)")}
+            if "error" not in columns:
+                db.execute("ALTER TABLE steps ADD COLUMN error TEXT")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5)
+        db.execute("PRAGMA foreign_keys = ON")
+        return db
+
+    def record_run(self, profile_name, started_at, stopped, steps):
+        """Store one run and its per-step metrics (dicts from ProcessRunner)."""
+        with self._connect() as db:
+            cur = db.execute(
+                "INSERT INTO runs (profile, started_at, stopped) VALUES (?, ?, ?)",
+                (profile_name, started_at or time.time(), int(bool(stopped))),
+            )
+            run_id = cur.lastrowid
+            db.executemany(
+                "INSERT INTO steps (run_id, step, label, spawn_ms, first_output_s,"
+                " ready_s, ready_via, exit_code, duration_s, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        m["step"],
+                        m["label"],
+                        m["spawn_ms"],
+                        m["first_output_s"],
+                        m["ready_s"],
+                        m["ready_via"],
+                        m["exit_code"],
+                        m["duration_s"],
+                        m.get("error"),
+                    )
+                    for m in steps
+                ],
+            )
+            db.execute(
+                "DELETE FROM runs WHERE profile = ? AND id NOT IN"
+                " (SELECT id FROM runs WHERE profile = ?"
+                " ORDER BY started_at DESC LIMIT ?)",
+                (profile_name, profile_name, MAX_RUNS_PER_PROFILE),
+            )
+
+    def recorder(self, profile_name):
+        """Return a ProcessRunner.on_metrics callback recording into this store."""
+
+        def on_metrics(started_at, stopped, steps):
+            self.record_run(profile_name, started_at, stopped, steps)
+
+        return on_metrics
+
+    def profiles(self):
+        """Profile names that have recorded runs, most recently run first."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT profile FROM runs GROUP BY profile"
+                " ORDER BY MAX(started_at) DESC"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def step_series(self, profile_name):
+        """
+        Return {(step, label): [row, ...]} for a profile, oldest run first. Each row
+        is a dict with started_at plus the recorded step metrics.
+        """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT r.started_at, s.step, s.label, s.spawn_ms, s.first_output_s,"
+                " s.ready_s, s.exit_code, s.duration_s, s.error"
+                " FROM steps s JOIN runs r ON r.id = s.run_id"
+                " WHERE r.profile = ? ORDER BY r.started_at",
+                (profile_name,),
+            ).fetchall()
+        series = {}
+        for row in map(dict, rows):
+            key = (row.pop("step"), row.pop("label"))
+            series.setdefault(key, []).append(row)
+        return series
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def sparkline(values, width=20):
+    """Render the last `width` values as a unicode sparkline."""
+    values = values[-width:]
+    if not values:
+        return ""
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1
+    return "".join(
+        SPARK_CHARS[int((v - lo) / span * (len(SPARK_CHARS) - 1))] for v in values
+    )
+
+
+def startup_time(row):
+    """The startup metric trended per step: readiness, else time to first output."""
+    if row["ready_s"] is not None:
+        return row["ready_s"]
+    return row["first_output_s"]
+
+
+def summarize_step(rows):
+    """
+    Percentiles, trend and regression verdict for one step's history rows.
+    The last RECENT_RUNS runs are compared against the BASELINE_RUNS before them.
+    """
+    startup = [v for v in (startup_time(r) for r in rows) if v is not None]
+    spawn = [r["spawn_ms"] for r in rows if r["spawn_ms"] is not None]
+    summary = {
+        "runs": len(rows),
+        "spawn_p50": percentile(spawn, 50) if spawn else None,
+        "startup_p50": percentile(startup, 50) if startup else None,
+        "startup_p90": percentile(startup, 90) if startup else None,
+        "startup_p95": percentile(startup, 95) if startup else None,
+        "failures": sum(
+            1 for r in rows if r["error"] or r["exit_code"] not in (None, 0)
+        ),
+        "trend": sparkline(startup),
+        "regression": None,
+    }
+    recent = startup[-RECENT_RUNS:]
+    baseline = startup[-(RECENT_RUNS + BASELINE_RUNS) : -RECENT_RUNS]
+    if len(recent) == RECENT_RUNS and len(baseline) >= RECENT_RUNS:
+        recent_median = statistics.median(recent)
+        baseline_median = statistics.median(baseline)
+        if (
+            recent_median > baseline_median * REGRESSION_RATIO
+            and recent_median - baseline_median > REGRESSION_MIN_SECONDS
+        ):
+            summary["regression"] = (baseline_median, recent_median)
+    return summary
+
+
+def _fmt_s(value):
+    return "—" if value is None else f"{value:.2f}s"
+
+
+class HistoryPopup(ctk.CTkToplevel):
+    """
+    Pop-up window with per-step startup percentiles, trends and regressions.
+    """
+
+    def __init__(self, master, store):
+        super().__init__(master)
+        self.title("Run History")
+        self.geometry("900x450")
+        self.resizable(True, True)
+        self.store = store
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        # Profile selector
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 5))
+        ctk.CTkLabel(
+            top, text="Profile:", font=ctk.CTkFont(size=14, weight="bold")
+        ).grid(row=0, column=0, padx=(0, 10))
+        profiles = store.profiles()
+        self.profile_var = ctk.StringVar(value=profiles[0] if profiles else "")
+        ctk.CTkOptionMenu(
+            top,
+            values=profiles or [""],
+            variable=self.profile_var,
+            command=lambda _: self._load(),
+        ).grid(row=0, column=1)
+        self.summary_label = ctk.CTkLabel(top, text="", text_color="gray")
+        self.summary_label.grid(row=0, column=2, padx=10)
+
+        frame = ctk.CTkFrame(self)
+        frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+
+        columns = (
+            "step",
+            "runs",
+            "spawn",
+            "p50",
+            "p90",
+            "p95",
+            "failures",
+            "trend",
+            "status",
+        )
+        self.tree = ttk.Treeview(
+            frame, columns=columns, show="headings", style="Treeview"
+        )
+        for col, width, heading in zip(
+            columns,
+            [200, 50, 80, 70, 70, 70, 60, 160, 160],
+            [
+                "Step",
+                "Runs",
+                "Spawn p50",
+                "Ready p50",
+                "Ready p90",
+                "Ready p95",
+                "Failed",
+                "Trend",
+                "Status",
+            ],
+        ):
+            self.tree.heading(col, text=heading)
+            self.tree.column(
+                col, width=width, anchor="w" if col == "step" else "center"
+            )
+        self.tree.tag_configure("regression", foreground="#f0ad4e")
+
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        vsb.grid(row=0, column=1, sticky="ns")
+
+        ctk.CTkLabel(
+            self,
+            text=(
+                "Ready = first matching ready_pattern line or first listening port, "
+                "else first output. Regression: median of the last "
+                f"{RECENT_RUNS} runs over {int((REGRESSION_RATIO - 1) * 100)}% "
+                f"slower than the {BASELINE_RUNS} runs before them."
+            ),
+            text_color="gray",
+            font=ctk.CTkFont(size=11),
+            wraplength=860,
+        ).grid(row=2, column=0, padx=10, pady=(0, 5), sticky="w")
+
+        btn_frame = ctk.CTkFrame(self, fg_color="transparent")
+        btn_frame.grid(row=3, column=0, pady=10)
+        ctk.CTkButton(btn_frame, text="Refresh", width=120, command=self._load).grid(
+            row=0, column=0, padx=5
+        )
+        ctk.CTkButton(btn_frame, text="Close", width=120, command=self.destroy).grid(
+            row=0, column=1, padx=5
+        )
+
+        self._load()
+
+    def _load(self):
+        """Recompute the table for the selected profile."""
+        self.tree.delete(*self.tree.get_children())
+        profile = self.profile_var.get()
+        if not profile:
+            self.summary_label.configure(text="No runs recorded yet")
+            return
+        series = self.store.step_series(profile)
+        regressions = 0
+        for (step, label), rows in sorted(series.items()):
+            s = summarize_step(rows)
+            if s["regression"]:
+                regressions += 1
+                before, after = s["regression"]
+                status = f"⚠ slower: {before:.2f}s → {after:.2f}s"
+            elif rows[-1]["error"]:
+                status = "‼ failed to launch last run"
+            else:
+                status = "ok"
+            self.tree.insert(
+                "",
+                "end",
+                values=(
+                    f"{step}. {label}",
+                    s["runs"],
+                    "—" if s["spawn_p50"] is None else f"{s['spawn_p50']:.1f} ms",
+                    _fmt_s(s["startup_p50"]),
+                    _fmt_s(s["startup_p90"]),
+                    _fmt_s(s["startup_p95"]),
+                    s["failures"],
+                    s["trend"],
+                    status,
+                ),
+                tags=("regression",) if s["regression"] else (),
+            )
+        self.summary_label.configure(
+            text=f"{len(series)} steps, {regressions} regressed"
+        )
@@ -0,0 +1,120 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+from modules.profile_manager import get_config_dir
+
+PROFILE_DIR = get_config_dir() / "profiler"
+THREAD_PREFIX = "fluxpilot-"  # launcher threads worth sampling besides the main one
+MAX_DEPTH = 128  # deeper stacks are cut at the root end
+
+
+def _frame_label(code):
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    """
+    Low-rate in-process sampling profiler for diagnosing UI stalls.
+
+    A background thread wakes every interval seconds, takes sys._current_frames()
+    and records the stack of the Tk main thread and of every launcher thread
+    (names starting with THREAD_PREFIX: runner, reader and monitor threads).
+    Stacks are aggregated on the fly as collapsed stacks
+    ("thread;outer;...;inner" -> count), the format read by flamegraph.pl,
+    speedscope and inferno, so memory stays bounded by the number of distinct
+    stacks rather than by session length.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.sampling_time = 0.0  # seconds spent inside _sample, for overhead
+        self.started_at = None
+        self.stopped_at = None
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self.stopped_at = None
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self.stopped_at = time.monotonic()
+
+    def _loop(self):
+        main_ident = threading.main_thread().ident
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter()
+            self._sample(main_ident)
+            self.sampling_time += time.perf_counter() - started
+
+    def _sample(self, main_ident):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        frames = sys._current_frames()
+        collapsed = []
+        for ident, frame in frames.items():
+            name = names.get(ident, "")
+            if ident != main_ident and not name.startswith(THREAD_PREFIX):
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_DEPTH:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append("MainThread" if ident == main_ident else name)
+            collapsed.append(";".join(reversed(labels)))
+        del frames
+        with self.lock:
+            self.samples += 1
+            self.stacks.update(collapsed)
+
+    def stats(self):
+        """Return (samples, overhead percent of one core) so far."""
+        end = self.stopped_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0
+        overhead = self.sampling_time / elapsed * 100 if elapsed else 0.0
+        return self.samples, overhead
+
+    def export(self, path=None):
+        """
+        Write the collapsed stacks ("frame;frame;frame count" per line) and return
+        the file path. Defaults to a timestamped file under PROFILE_DIR.
+        """
+        if path is None:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            path = PROFILE_DIR / time.strftime("fluxpilot-%Y%m%d-%H%M%S.collapsed")
+        with self.lock:
+            lines = [f"{stack} {count}\n" for stack, count in self.stacks.items()]
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(sorted(lines))
+        return path
+
+    def merge(self, stacks, root):
+        """Add collapsed stacks sampled in another process under a root frame."""
+        with self.lock:
+            for stack, count in stacks.items():
+                self.stacks[f"{root};{stack}"] += count
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+        self.sampling_time = 0.0